@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from feature_extractor import FeatureExtractor
+from pose_utils import (
+    calculate_angle,
+    compare_poses,
+    compute_all_angle_directions,
+    compute_all_angles,
+    compute_all_angles_and_directions,
+    compute_angles_and_directions_batch
+)
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+REFERENCE_FILE = os.path.join(MODEL_DIR, "json_reference", "downward_dog_reference.json")
+DEFAULT_SIZES = (1, 16, 256)
+
+# Modules that scoring workers and API frontends import; they must stay NumPy-only
+LIGHTWEIGHT_MODULES = ("pose_utils", "coach", "reference_index", "feature_extractor", "metrics", "landmark_cache", "landmark_recording", "pose_detector")
+HEAVY_MODULES = ("mediapipe", "cv2", "tensorflow", "google.protobuf")
+DEFAULT_IMPORT_BUDGET_S = 0.5
+
+
+def synthetic_keypoints(n, seed=0):
+    """
+    Deterministic (n, 33, 4) landmark fixture: a standing figure with per-frame jitter.
+    """
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(0.2, 0.8, size=(33, 4))
+    base[:, 3] = rng.uniform(0.6, 1.0, size=33)
+    keypoints = base + rng.normal(scale=0.02, size=(n, 33, 4))
+    keypoints[:, :, 3] = np.clip(keypoints[:, :, 3], 0.0, 1.0)
+    return keypoints
+
+
+def synthetic_results(keypoints):
+    """
+    Mediapipe-like results objects for each frame of a keypoint fixture.
+    """
+    return [
+        SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=[
+            SimpleNamespace(x=x, y=y, z=z, visibility=v) for x, y, z, v in frame
+        ]))
+        for frame in keypoints
+    ]
+
+
+def measure(fn, items, repeat=5, min_time=0.05):
+    """
+    Time fn() (which processes `items` items) and return per-run statistics in seconds.
+    Each sample repeats fn until min_time has elapsed, to stay above timer resolution.
+    """
+    fn()  # warm-up
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+
+    median = statistics.median(samples)
+    return {
+        "items": items,
+        "median_s": median,
+        "min_s": min(samples),
+        "per_item_us": median / items * 1e6
+    }
+
+
+def geometry_benchmarks(sizes, repeat):
+    with open(REFERENCE_FILE, "r") as f:
+        reference = json.load(f)
+    angles_ref, dirs_ref = reference["angles"], reference["directions"]
+    extractor = FeatureExtractor()
+
+    results = {}
+    for n in sizes:
+        keypoints = synthetic_keypoints(n)
+        frames = synthetic_results(keypoints)
+        points = [tuple(p) for p in keypoints[:, 11:16:2, :2].reshape(-1, 2)]
+        angles = [compute_all_angles(r) for r in frames]
+        dirs = [compute_all_angle_directions(r) for r in frames]
+        batch_angles, _ = compute_angles_and_directions_batch(keypoints)
+
+        cases = {
+            "calculate_angle": lambda: [calculate_angle(*points[i * 3:i * 3 + 3]) for i in range(n)],
+            "compute_all_angles": lambda: [compute_all_angles(r) for r in frames],
+            "compute_all_angle_directions": lambda: [compute_all_angle_directions(r) for r in frames],
+            "compute_all_angles_and_directions": lambda: [compute_all_angles_and_directions(r) for r in frames],
+            "compute_angles_and_directions_batch": lambda: compute_angles_and_directions_batch(keypoints),
+            "compare_poses": lambda: [compare_poses(a, angles_ref, d, dirs_ref) for a, d in zip(angles, dirs)],
+            "extract_features": lambda: [extractor.extract_features(k, a) for k, a in zip(keypoints, angles)],
+            "extract_features_batch": lambda: extractor.extract_features_batch(keypoints, batch_angles)
+        }
+        for name, fn in cases.items():
+            results.setdefault(name, {})[str(n)] = measure(fn, n, repeat)
+            print(f"{name:40s} n={n:<5d} {results[name][str(n)]['per_item_us']:10.2f} us/item")
+    return results
+
+
+def detector_benchmarks(repeat):
+    """
+    End-to-end detect_pose over the bundled Images set (no annotated output).
+    """
+    from build_references import find_pose_folders
+    from pose_detector import PoseDetector
+
+    detector = PoseDetector(render_every=0)
+    images = [image for pose_images in find_pose_folders().values() for image in pose_images]
+    result = measure(lambda: [detector.detect_pose(i, save_landmarks=False) for i in images],
+                     len(images), repeat=repeat, min_time=0.0)
+    print(f"{'detect_pose':40s} n={len(images):<5d} {result['per_item_us']:10.2f} us/item")
+    return {"detect_pose": {str(len(images)): result}}
+
+
+def run(sizes=DEFAULT_SIZES, repeat=5, detector=True):
+    results = geometry_benchmarks(sizes, repeat)
+    if detector:
+        results.update(detector_benchmarks(max(1, repeat // 2)))
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "results": results
+    }
+
+
+def import_check(budget_s=DEFAULT_IMPORT_BUDGET_S):
+    """
+    Import the geometry/coaching modules in a fresh interpreter and check that no heavy
+    dependency gets pulled in and that the import fits in budget_s seconds (on top of NumPy).
+    Returns: (ok, report dict)
+    """
+    code = (
+        "import json, sys, time\n"
+        "import numpy\n"
+        "start = time.perf_counter()\n"
+        f"for name in {LIGHTWEIGHT_MODULES!r}:\n"
+        "    __import__(name)\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'elapsed_s': elapsed, 'heavy_modules': heavy}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=MODEL_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    report = json.loads(output.strip().splitlines()[-1])
+    ok = not report["heavy_modules"] and report["elapsed_s"] <= budget_s
+    print(f"Import of {', '.join(LIGHTWEIGHT_MODULES)}: {report['elapsed_s'] * 1000:.1f} ms "
+          f"(budget {budget_s * 1000:.0f} ms), heavy modules loaded: {report['heavy_modules'] or 'none'}")
+    return ok, report
+
+
+def compare(current, baseline, tolerance=0.1):
+    """
+    Compare per-item medians against a baseline report.
+    Returns: list of (benchmark, size, baseline_us, current_us) that got slower than tolerance allows
+    """
+    regressions = []
+    for name, sizes in current["results"].items():
+        for size, stats in sizes.items():
+            base = baseline["results"].get(name, {}).get(size)
+            if base is None:
+                continue
+            ratio = stats["per_item_us"] / base["per_item_us"]
+            marker = "REGRESSION" if ratio > 1 + tolerance else ""
+            print(f"{name:40s} n={size:<5s} {base['per_item_us']:10.2f} -> {stats['per_item_us']:10.2f} us/item ({ratio:5.2f}x) {marker}")
+            if marker:
+                regressions.append((name, size, base["per_item_us"], stats["per_item_us"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection, geometry and coaching hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Batch sizes for geometry benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing samples per benchmark")
+    parser.add_argument("--no-detector", action="store_true", help="Skip the end-to-end detect_pose benchmark")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a stored JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown before flagging a regression (0.1 = 10%%)")
+    parser.add_argument("--import-check", action="store_true", help="Only check the import time/dependencies of the geometry and coaching modules")
+    parser.add_argument("--import-budget", type=float, default=DEFAULT_IMPORT_BUDGET_S, help="Import time budget in seconds")
+    args = parser.parse_args()
+
+    if args.import_check:
+        ok, _ = import_check(args.import_budget)
+        sys.exit(0 if ok else 1)
+
+    report = run(args.sizes, args.repeat, detector=not args.no_detector)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        print(f"\n### Comparison against {args.compare} ###")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
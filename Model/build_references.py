@@ -0,0 +1,174 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from landmark_cache import LandmarkCache
+from pose_utils import compute_angles_and_directions_batch
+from reference_stats import ReferenceStats, write_reference
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(MODEL_DIR, "Images")
+REFERENCE_DIR = os.path.join(MODEL_DIR, "json_reference")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# PoseDetector arguments used by every worker (also part of the landmark cache key)
+DETECTOR_PARAMS = {
+    "static_image_mode": True,
+    "model_complexity": 1,
+    "min_detection_confidence": 0.5,
+    "min_tracking_confidence": 0.5
+}
+
+NOT_DETECTED = "Pose not detected"
+
+# One warm detector per worker process, created by _init_worker
+_detector = None
+
+
+def _image_sort_key(filename):
+    stem = os.path.splitext(filename)[0]
+    return (0, int(stem), filename) if stem.isdigit() else (1, 0, filename)
+
+
+def find_pose_folders(images_dir=IMAGES_DIR):
+    """
+    Find every pose folder under images_dir.
+    Returns: dict pose_name -> list of image paths relative to images_dir, e.g. "downward_dog/1.png"
+    """
+    poses = {}
+    for pose_name in sorted(os.listdir(images_dir)):
+        pose_dir = os.path.join(images_dir, pose_name)
+        if not os.path.isdir(pose_dir):
+            continue
+        images = sorted(
+            (f for f in os.listdir(pose_dir) if f.lower().endswith(IMAGE_EXTENSIONS)),
+            key=_image_sort_key
+        )
+        if images:
+            poses[pose_name] = [f"{pose_name}/{f}" for f in images]
+    return poses
+
+
+def _init_worker(images_dir):
+    global _detector
+    from pose_detector import PoseDetector
+    _detector = PoseDetector(**DETECTOR_PARAMS)
+    _detector.images_dir = images_dir
+
+
+def _detect(pose_name, image_name):
+    """
+    Worker task: run the detector on one image.
+    Returns: (pose_name, image_name, keypoints or None, confidence, error message or None)
+    """
+    try:
+        _, keypoints, confidence = _detector.detect_pose(image_name, save_landmarks=False)
+    except Exception as e:
+        return pose_name, image_name, None, 0.0, str(e)
+    if keypoints is None:
+        return pose_name, image_name, None, 0.0, NOT_DETECTED
+    return pose_name, image_name, keypoints, confidence, None
+
+
+def reduce_pose(pose_name, keypoints_list):
+    """
+    Reduce the keypoints of all images of one pose into a reference dict:
+    mean angle and most common direction per joint, plus the running statistics
+    that let reference_stats.py add images or merge references later.
+    """
+    stats = ReferenceStats()
+    stats.add_batch(*compute_angles_and_directions_batch(np.stack(keypoints_list)))
+    return stats.to_reference(pose_name)
+
+
+def build_references(images_dir=IMAGES_DIR, output_dir=REFERENCE_DIR, poses=None, workers=None, cache_dir=None):
+    """
+    Build json_reference/<pose>_reference.json for every pose folder in one run.
+    Images are spread over a process pool with one PoseDetector per worker.
+    With cache_dir, unchanged images are served from a LandmarkCache owned by this process
+    and only new or modified images are sent to the workers.
+    Returns: dict pose_name -> list of (image_name, error) failures
+    """
+    pose_images = find_pose_folders(images_dir)
+    if poses:
+        missing = set(poses) - set(pose_images)
+        if missing:
+            raise FileNotFoundError(f"Pose folders not found in {images_dir}: {sorted(missing)}")
+        pose_images = {p: pose_images[p] for p in poses}
+
+    os.makedirs(output_dir, exist_ok=True)
+    remaining = {pose: len(images) for pose, images in pose_images.items()}
+    keypoints = {pose: [] for pose in pose_images}
+    failures = {pose: [] for pose in pose_images}
+
+    cache = LandmarkCache(cache_dir) if cache_dir else None
+    cache_keys = {}
+
+    def record(pose, image, kp, error):
+        if error is None:
+            keypoints[pose].append(kp)
+        else:
+            failures[pose].append((image, error))
+            print(f"[{pose}] {image}: {error}")
+
+        remaining[pose] -= 1
+        if remaining[pose]:
+            return
+
+        total = len(pose_images[pose])
+        if not keypoints[pose]:
+            print(f"[{pose}] no pose detected in any of {total} images, reference not written")
+            return
+        output_path = os.path.join(output_dir, f"{pose.lower()}_reference.json")
+        write_reference(output_path, reduce_pose(pose, keypoints[pose]))
+        print(f"[{pose}] {len(keypoints[pose])}/{total} images used, saved to {output_path}")
+
+    tasks = []
+    for pose, images in pose_images.items():
+        for image in images:
+            if cache is not None:
+                with open(os.path.join(images_dir, image), "rb") as f:
+                    key = cache.make_key(f.read(), DETECTOR_PARAMS)
+                cached = cache.get(key)
+                if cached is not None:
+                    kp = cached[0]
+                    record(pose, image, kp, None if kp is not None else NOT_DETECTED)
+                    continue
+                cache_keys[image] = key
+            tasks.append((pose, image))
+
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(images_dir,)) as pool:
+            futures = [pool.submit(_detect, pose, image) for pose, image in tasks]
+            for future in as_completed(futures):
+                pose, image, kp, confidence, error = future.result()
+                if cache is not None and error in (None, NOT_DETECTED):
+                    cache.put(cache_keys[image], kp, confidence)
+                record(pose, image, kp, error)
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Landmark cache: {stats['hits']} hits, {stats['misses']} misses")
+        cache.close()
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build averaged reference poses for every pose folder.")
+    parser.add_argument("--images", default=IMAGES_DIR, help="Folder containing one sub-folder per pose")
+    parser.add_argument("--output", default=REFERENCE_DIR, help="Folder for <pose>_reference.json files")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--cache", default=None, help="Landmark cache folder; skips inference for unchanged images")
+    parser.add_argument("poses", nargs="*", help="Only rebuild these poses")
+    args = parser.parse_args()
+
+    failures = build_references(args.images, args.output, args.poses or None, args.workers, args.cache)
+    failed = sum(len(f) for f in failures.values())
+    print(f"\nDone: {len(failures)} poses, {failed} failed images")
+
+
+if __name__ == "__main__":
+    main()
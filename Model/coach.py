@@ -0,0 +1,144 @@
+import time
+
+import numpy as np
+
+from pose_utils import (
+    ANGLE_NAMES,
+    DIRECTION_MISSING,
+    DIRECTION_NAMES,
+    JOINT_TEMPLATES,
+    adverb_for_diff,
+    angles_from_dict,
+    direction_to_en,
+    directions_from_dict,
+    render_joint_message
+)
+
+
+class CoachSession:
+    """
+    Stateful coach for a continuous stream of frames compared against one reference pose.
+
+    Compared with calling compare_poses on every frame it:
+    - smooths user angles with an exponential moving average,
+    - applies hysteresis around threshold_deg so a joint near the limit does not flicker
+      between "Hold" and a correction,
+    - only switches a direction cue after it has been wrong (or right) for direction_frames frames,
+    - renders a joint's message only when its cue changes, and returns only those joints,
+    - tracks how long the student has held the pose with every joint in tolerance.
+
+    A joint that stops being detected (NaN angle) is reported once as None, dropped from
+    self.fixes and restarts from scratch when it comes back; while any joint of the reference
+    is undetected the pose does not count as held.
+    """
+    def __init__(self, angles_ref, dirs_ref, threshold_deg=10.0, hysteresis_deg=2.0, smoothing=0.5, direction_frames=3):
+        """
+        - angles_ref / dirs_ref: reference dicts (as in json_reference) or (8,) arrays / direction codes
+        - smoothing: EMA weight of the newest frame (1.0 = no smoothing)
+        """
+        self.ref_angles = angles_from_dict(angles_ref) if isinstance(angles_ref, dict) else np.asarray(angles_ref, dtype=np.float64)
+        self.ref_dirs = directions_from_dict(dirs_ref) if isinstance(dirs_ref, dict) else np.asarray(dirs_ref, dtype=np.int8)
+        self.threshold_deg = threshold_deg
+        self.hysteresis_deg = hysteresis_deg
+        self.smoothing = smoothing
+        self.direction_frames = direction_frames
+
+        # Per-joint instructions that never change during a session
+        self._open_actions = [JOINT_TEMPLATES[name]["open_action"] for name in ANGLE_NAMES]
+        self._closed_actions = [JOINT_TEMPLATES[name]["closed_action"] for name in ANGLE_NAMES]
+        self._direction_actions = [
+            "Hold direction" if code == DIRECTION_MISSING else direction_to_en(DIRECTION_NAMES[code])
+            for code in self.ref_dirs
+        ]
+        self.reset()
+
+    def reset(self):
+        n = len(ANGLE_NAMES)
+        self._smoothed = np.full(n, np.nan)
+        self._correcting = np.zeros(n, dtype=bool)
+        self._dir_wrong = np.zeros(n, dtype=bool)
+        self._dir_streak = np.zeros(n, dtype=np.int32)
+        self._emitted = np.full(n, -1, dtype=np.int64)
+        self.fixes = {}
+        self.frames = 0
+        self.holding = False
+        self._hold_start = None
+        self.hold_time = 0.0
+
+    def update(self, angles, directions, timestamp=None):
+        """
+        Consume one frame of user angles and directions (dicts or (8,) arrays / codes).
+        Returns: dict of the joints whose cue changed since the previous frame,
+        in the same format as compare_poses, with None for joints that are no longer detected;
+        the full current state is in self.fixes.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        user_angles = angles_from_dict(angles) if isinstance(angles, dict) else np.asarray(angles, dtype=np.float64)
+        user_dirs = directions_from_dict(directions) if isinstance(directions, dict) else np.asarray(directions, dtype=np.int8)
+        self.frames += 1
+
+        tracked = ~np.isnan(self.ref_angles)
+        valid = ~np.isnan(user_angles) & tracked
+
+        # Joints that are lost forget their state, so a stale cue is neither shown nor blended in
+        lost = tracked & ~valid & (self._emitted != -1)
+        self._smoothed[~valid] = np.nan
+        self._dir_streak[~valid] = 0
+        self._dir_wrong &= valid
+
+        first = np.isnan(self._smoothed)
+        blended = self.smoothing * user_angles + (1.0 - self.smoothing) * self._smoothed
+        self._smoothed = np.where(valid, np.where(first, user_angles, blended), self._smoothed)
+
+        diff = self._smoothed - self.ref_angles
+        abs_diff = np.abs(diff)
+        enter = abs_diff > self.threshold_deg + self.hysteresis_deg
+        stay = abs_diff >= self.threshold_deg - self.hysteresis_deg
+        self._correcting = valid & np.where(self._correcting, stay, enter)
+
+        # A direction cue flips only after direction_frames consecutive frames disagree with it
+        wrong_now = (user_dirs != self.ref_dirs) & (self.ref_dirs != DIRECTION_MISSING)
+        streak = np.where(wrong_now != self._dir_wrong, self._dir_streak + 1, 0)
+        flip = valid & (streak >= self.direction_frames)
+        self._dir_wrong = np.where(flip, wrong_now, self._dir_wrong)
+        self._dir_streak = np.where(flip, 0, streak)
+
+        # Cue identity: angle action, direction action and how-much bucket
+        bucket = np.where(abs_diff < 8, 0, np.where(abs_diff < 15, 1, 2 + np.round(np.nan_to_num(abs_diff) / 5)))
+        angle_code = np.where(self._correcting, 1 + (diff > 0), 0)
+        key = (angle_code * 2 + self._dir_wrong) * 1000 + np.where(self._correcting, bucket, 0)
+        key = key.astype(np.int64)
+        changed = valid & (key != self._emitted)
+
+        updates = {}
+        for j in np.flatnonzero(lost):
+            self.fixes.pop(ANGLE_NAMES[j], None)
+            updates[ANGLE_NAMES[j]] = None
+        for j in np.flatnonzero(changed):
+            name = ANGLE_NAMES[j]
+            if self._correcting[j]:
+                angle_instr = self._open_actions[j] if diff[j] > 0 else self._closed_actions[j]
+            else:
+                angle_instr = "Hold"
+            dir_instr = self._direction_actions[j] if self._dir_wrong[j] else "Hold direction"
+            fix = {
+                "angle_diff_deg": int(round(abs_diff[j])),
+                "angle_action": angle_instr,
+                "direction_action": dir_instr,
+                "message_en": render_joint_message(name, angle_instr, adverb_for_diff(abs_diff[j]), dir_instr)
+            }
+            self.fixes[name] = fix
+            updates[name] = fix
+        self._emitted = np.where(changed, key, np.where(valid, self._emitted, -1))
+
+        # Held only while every reference joint is detected and in tolerance
+        self.holding = bool(tracked.any() and valid[tracked].all()) and not (self._correcting | self._dir_wrong).any()
+        if not self.holding:
+            self._hold_start = None
+            self.hold_time = 0.0
+        elif self._hold_start is None:
+            self._hold_start = timestamp
+        else:
+            self.hold_time = timestamp - self._hold_start
+        return updates
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from build_references import IMAGES_DIR, find_pose_folders
+from feature_extractor import FEATURE_SIZE, FeatureExtractor
+
+FEATURES_FILE = "features.f32"
+LABELS_FILE = "labels.i32"
+META_FILE = "meta.json"
+
+
+class FeatureDatasetWriter:
+    """
+    Stream feature rows and integer pose labels into raw float32 / int32 files
+    that FeatureDataset can memory-map without copying.
+    """
+    def __init__(self, output_dir, label_names):
+        self.output_dir = output_dir
+        self.label_names = list(label_names)
+        self.count = 0
+        self.sources = []
+        os.makedirs(output_dir, exist_ok=True)
+        self._features = open(os.path.join(output_dir, FEATURES_FILE), "wb")
+        self._labels = open(os.path.join(output_dir, LABELS_FILE), "wb")
+
+    def append(self, features, labels, sources=None):
+        """
+        Append a (N,140) float32 block and its (N,) labels; sources optionally names each row.
+        """
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        labels = np.ascontiguousarray(labels, dtype=np.int32)
+        if features.ndim != 2 or features.shape[1] != FEATURE_SIZE or labels.shape != (features.shape[0],):
+            raise ValueError(f"Expected features (N, {FEATURE_SIZE}) and labels (N,)")
+        self._features.write(features.tobytes())
+        self._labels.write(labels.tobytes())
+        self.count += features.shape[0]
+        self.sources.extend(sources if sources is not None else [None] * features.shape[0])
+
+    def close(self):
+        self._features.close()
+        self._labels.close()
+        meta = {
+            "count": self.count,
+            "feature_size": FEATURE_SIZE,
+            "dtype": "float32",
+            "label_names": self.label_names,
+            "sources": self.sources
+        }
+        with open(os.path.join(self.output_dir, META_FILE), "w") as f:
+            json.dump(meta, f, indent=4)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FeatureDataset:
+    """
+    Read-only, memory-mapped view of a dataset written by FeatureDatasetWriter.
+        features: (N,140) float32 memmap
+        labels: (N,) int32 memmap, indices into label_names
+    """
+    def __init__(self, dataset_dir):
+        with open(os.path.join(dataset_dir, META_FILE), "r") as f:
+            self.meta = json.load(f)
+        self.label_names = self.meta["label_names"]
+        self.sources = self.meta["sources"]
+        count = self.meta["count"]
+        if count:
+            self.features = np.memmap(os.path.join(dataset_dir, FEATURES_FILE), dtype=np.float32,
+                                      mode="r", shape=(count, self.meta["feature_size"]))
+            self.labels = np.memmap(os.path.join(dataset_dir, LABELS_FILE), dtype=np.int32,
+                                    mode="r", shape=(count,))
+        else:
+            self.features = np.empty((0, self.meta["feature_size"]), dtype=np.float32)
+            self.labels = np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def build_feature_dataset(output_dir, images_dir=IMAGES_DIR, detector=None, batch_size=64):
+    """
+    Detect every image of every pose folder and stream its features into a dataset.
+    Keypoints and features for each batch go into buffers allocated once; images
+    without a detected pose are skipped.
+    Returns: number of rows written
+    """
+    if detector is None:
+        from pose_detector import PoseDetector
+        detector = PoseDetector(render_every=0)
+    detector.images_dir = images_dir
+
+    pose_images = find_pose_folders(images_dir)
+    extractor = FeatureExtractor()
+    keypoints = np.empty((batch_size, 33, 4), dtype=np.float64)
+    labels = np.empty(batch_size, dtype=np.int32)
+    features = np.empty((batch_size, FEATURE_SIZE), dtype=np.float32)
+    sources = []
+
+    def write_batch(writer):
+        n = len(sources)
+        extractor.extract_features_batch(keypoints[:n], out=features[:n])
+        writer.append(features[:n], labels[:n], sources)
+        sources.clear()
+
+    with FeatureDatasetWriter(output_dir, list(pose_images)) as writer:
+        for label, (pose_name, images) in enumerate(pose_images.items()):
+            for image_name in images:
+                _, kp, _ = detector.detect_pose(image_name, save_landmarks=False)
+                if kp is None:
+                    print(f"[{pose_name}] {image_name}: Pose not detected, skipped")
+                    continue
+                keypoints[len(sources)] = kp
+                labels[len(sources)] = label
+                sources.append(image_name)
+                if len(sources) == batch_size:
+                    write_batch(writer)
+        if sources:
+            write_batch(writer)
+        total = writer.count
+
+    print(f"Wrote {total} feature rows for {len(pose_images)} poses to {output_dir}")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a memory-mapped feature dataset from pose image folders.")
+    parser.add_argument("output", help="Dataset output folder")
+    parser.add_argument("--images", default=IMAGES_DIR, help="Folder containing one sub-folder per pose")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    build_feature_dataset(args.output, args.images, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 # feature_extractor.py
 import numpy as np
 
+from pose_utils import ANGLE_NAMES, angles_from_dict, compute_angles_and_directions_batch
+
+NUM_KEYPOINT_FEATURES = 33 * 4
+FEATURE_SIZE = NUM_KEYPOINT_FEATURES + len(ANGLE_NAMES)
+
 class FeatureExtractor:
     def __init__(self):
         pass
@@ -13,26 +18,38 @@ class FeatureExtractor:
 
         Returns: 1D numpy array
         """
-        features = []
+        features = np.zeros(FEATURE_SIZE, dtype=np.float32)
 
-        # Flatten keypoints (replace None with 0 just in case)
+        # Flatten keypoints (missing keypoints stay 0)
         if keypoints is not None:
-            flat_keypoints = keypoints.flatten()
-            features.extend(flat_keypoints)
-        else:
-            features.extend([0.0]*33*4)
+            features[:NUM_KEYPOINT_FEATURES] = np.asarray(keypoints).reshape(-1)
 
-        # Append angles in the same order as ANGLE_NAMES
+        # Append angles in the same order as ANGLE_NAMES (None -> 0)
         if angles is not None:
-            for angle_name in [
-                "left_elbow_angle", "right_elbow_angle",
-                "left_shoulder_angle", "right_shoulder_angle",
-                "left_knee_angle", "right_knee_angle",
-                "left_hip_angle", "right_hip_angle"
-            ]:
-                val = angles.get(angle_name)
-                features.append(val if val is not None else 0.0)
-        else:
-            features.extend([0.0]*8)
-
-        return np.array(features, dtype=np.float32)
+            features[NUM_KEYPOINT_FEATURES:] = np.nan_to_num(angles_from_dict(angles))
+
+        return features
+
+    def extract_features_batch(self, keypoints, angles=None, out=None):
+        """
+        Generate feature vectors for a batch of frames, written straight into one buffer.
+        - keypoints: numpy array (N,33,4) [x,y,z,visibility]
+        - angles: (N,8) array in ANGLE_NAMES order; computed from keypoints when None
+        - out: optional preallocated (N,140) float32 array to fill
+
+        Returns: (N,140) float32 array (out, if given); NaN values are written as 0
+        """
+        keypoints = np.asarray(keypoints)
+        n = keypoints.shape[0]
+        if out is None:
+            out = np.empty((n, FEATURE_SIZE), dtype=np.float32)
+        elif out.shape != (n, FEATURE_SIZE) or out.dtype != np.float32:
+            raise ValueError(f"out must be a float32 array of shape {(n, FEATURE_SIZE)}")
+
+        if angles is None:
+            angles, _ = compute_angles_and_directions_batch(keypoints)
+
+        out[:, :NUM_KEYPOINT_FEATURES] = keypoints.reshape(n, NUM_KEYPOINT_FEATURES)
+        out[:, NUM_KEYPOINT_FEATURES:] = angles
+        np.nan_to_num(out, copy=False)
+        return out
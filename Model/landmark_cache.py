@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+KEYPOINT_SHAPE = (33, 4)
+OWNER_SIZE = 20  # sha1 digest of the key owning a slot
+
+
+class LandmarkCache:
+    """
+    Persistent on-disk cache of detection results, keyed by image content and detector parameters.
+
+    Keypoints live in a fixed-size memory-mapped float32 file (one (33, 4) slot per entry), next to
+    a memory-mapped table recording which key owns each slot; a small JSON index maps each key to
+    its slot and keeps the entries in LRU order. The index is rewritten every flush_every inserts
+    and on flush()/close(); entries whose slot was reused after the last index write are detected
+    through the owner table and dropped on load.
+    The cache is meant to be owned by one process at a time.
+    """
+    INDEX_FILE = "index.json"
+    DATA_FILE = "keypoints.f32"
+    OWNERS_FILE = "owners.bin"
+    VERSION = 2
+
+    def __init__(self, cache_dir, max_entries=10000, flush_every=256):
+        """
+        - max_entries: number of slots; opening an existing cache with a different size
+          migrates its most recently used entries
+        - flush_every: rewrite the index after this many inserts (0 = only on flush/close)
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._dirty = False
+        self._unflushed_puts = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, self.INDEX_FILE)
+        self._data_path = os.path.join(cache_dir, self.DATA_FILE)
+        self._owners_path = os.path.join(cache_dir, self.OWNERS_FILE)
+
+        # key -> [slot, detected, confidence], least recently used first
+        self._entries = OrderedDict()
+        self._open_store()
+        used = {slot for slot, _, _ in self._entries.values()}
+        self._free_slots = [s for s in range(max_entries - 1, -1, -1) if s not in used]
+
+    @staticmethod
+    def make_key(image_bytes, params):
+        """
+        Hash the encoded image bytes together with the detector parameters.
+        """
+        digest = hashlib.sha1(image_bytes)
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached detection.
+        Returns:
+            None on a cache miss, otherwise (keypoints, confidence);
+            keypoints is None if no pose was detected in the cached image
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        self._dirty = True
+        slot, detected, confidence = entry
+        if not detected:
+            return None, 0.0
+        return np.array(self._keypoints[slot], dtype=np.float64), confidence
+
+    def put(self, key, keypoints, confidence):
+        """
+        Store a detection (keypoints may be None for "no pose found"), evicting the LRU entry if full.
+        """
+        if key in self._entries:
+            slot = self._entries.pop(key)[0]
+        else:
+            if not self._free_slots:
+                _, (evicted_slot, _, _) = self._entries.popitem(last=False)
+                self._free_slots.append(evicted_slot)
+                self.evictions += 1
+            slot = self._free_slots.pop()
+
+        detected = keypoints is not None
+        if detected:
+            self._keypoints[slot] = keypoints
+        self._owners[slot] = _owner_digest(key)
+        self._entries[key] = [slot, detected, float(confidence)]
+        self._dirty = True
+        self._unflushed_puts += 1
+        if self.flush_every and self._unflushed_puts >= self.flush_every:
+            self.flush()
+
+    def invalidate(self, key=None):
+        """
+        Drop one entry, or every entry when key is None.
+        """
+        if key is None:
+            slots = [slot for slot, _, _ in self._entries.values()]
+            self._entries.clear()
+        elif key in self._entries:
+            slots = [self._entries.pop(key)[0]]
+        else:
+            return
+        self._owners[slots] = 0
+        self._free_slots.extend(slots)
+        self.flush(force=True)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+    def flush(self, force=False):
+        """
+        Persist keypoints and the index (including LRU order) to disk.
+        """
+        if not (force or self._dirty):
+            return
+        self._keypoints.flush()
+        self._owners.flush()
+        self._write_index()
+
+    def close(self):
+        self.flush()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _open_store(self):
+        """
+        Open (or create) the data files, keeping the valid entries of an existing cache.
+        """
+        index = self._read_index()
+        if index is None:
+            self._keypoints = np.memmap(self._data_path, dtype=np.float32, mode="w+", shape=(self.max_entries,) + KEYPOINT_SHAPE)
+            self._owners = np.memmap(self._owners_path, dtype=np.uint8, mode="w+", shape=(self.max_entries, OWNER_SIZE))
+            self._write_index()
+            return
+
+        stored_max = index["max_entries"]
+        keypoints = np.memmap(self._data_path, dtype=np.float32, mode="r+", shape=(stored_max,) + KEYPOINT_SHAPE)
+        if index["version"] == 1:
+            # Version 1 rewrote the index on every insert, so it always matches the data file
+            owners = np.memmap(self._owners_path, dtype=np.uint8, mode="w+", shape=(stored_max, OWNER_SIZE))
+            for key, slot, _, _ in index["entries"]:
+                owners[slot] = _owner_digest(key)
+        else:
+            owners = np.memmap(self._owners_path, dtype=np.uint8, mode="r+", shape=(stored_max, OWNER_SIZE))
+
+        for key, slot, detected, confidence in index["entries"]:
+            if np.array_equal(owners[slot], _owner_digest(key)):
+                self._entries[key] = [slot, detected, confidence]
+
+        if stored_max == self.max_entries:
+            self._keypoints, self._owners = keypoints, owners
+        else:
+            self._migrate(keypoints)
+        self._write_index()
+
+    def _migrate(self, old_keypoints):
+        """
+        Copy the most recently used entries of a cache created with another max_entries
+        into freshly sized files, then swap them in.
+        """
+        kept = list(self._entries.items())[-self.max_entries:]
+        shape = (self.max_entries,) + KEYPOINT_SHAPE
+        keypoints = np.memmap(self._data_path + ".tmp", dtype=np.float32, mode="w+", shape=shape)
+        owners = np.memmap(self._owners_path + ".tmp", dtype=np.uint8, mode="w+", shape=(self.max_entries, OWNER_SIZE))
+        self._entries.clear()
+        for new_slot, (key, (slot, detected, confidence)) in enumerate(kept):
+            keypoints[new_slot] = old_keypoints[slot]
+            owners[new_slot] = _owner_digest(key)
+            self._entries[key] = [new_slot, detected, confidence]
+        keypoints.flush()
+        owners.flush()
+        del keypoints, owners, old_keypoints
+        os.replace(self._data_path + ".tmp", self._data_path)
+        os.replace(self._owners_path + ".tmp", self._owners_path)
+        self._keypoints = np.memmap(self._data_path, dtype=np.float32, mode="r+", shape=shape)
+        self._owners = np.memmap(self._owners_path, dtype=np.uint8, mode="r+", shape=(self.max_entries, OWNER_SIZE))
+
+    def _read_index(self):
+        """
+        Returns: the stored index if it can be used with the data files on disk, else None
+        """
+        if not os.path.exists(self._index_path) or not os.path.exists(self._data_path):
+            return None
+        try:
+            with open(self._index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if index.get("version") not in (1, self.VERSION):
+            return None
+        stored_max = index.get("max_entries")
+        if not isinstance(stored_max, int) or stored_max < 1:
+            return None
+        if os.path.getsize(self._data_path) != stored_max * int(np.prod(KEYPOINT_SHAPE)) * 4:
+            return None
+        if index["version"] == self.VERSION and (
+                not os.path.exists(self._owners_path) or os.path.getsize(self._owners_path) != stored_max * OWNER_SIZE):
+            return None
+        return index
+
+    def _write_index(self):
+        index = {
+            "version": self.VERSION,
+            "max_entries": self.max_entries,
+            "entries": [[key] + entry for key, entry in self._entries.items()]
+        }
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)
+        self._dirty = False
+        self._unflushed_puts = 0
+
+
+def _owner_digest(key):
+    return np.frombuffer(hashlib.sha1(key.encode("utf-8")).digest(), dtype=np.uint8)
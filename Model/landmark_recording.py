@@ -0,0 +1,265 @@
+import os
+import struct
+
+import numpy as np
+
+from pose_utils import compare_poses_batch, compute_angles_and_directions_batch
+
+# File layout (little endian):
+#   header:  magic, version, keypoint dtype flag, chunk size
+#   chunks:  "CHNK", n frames, timestamps f8[n], confidence f4[n], keypoints f4/f2[n, 33, 4] (padded to 8 bytes)
+#   footer:  chunk index (see INDEX_DTYPE), then index offset, chunk count and an end magic
+# A recording that was not closed has no footer; the reader then rebuilds the index from chunk headers.
+MAGIC = b"YOBAREC1"
+END_MAGIC = b"YOBAIDX1"
+VERSION = 1
+HEADER = struct.Struct("<8sHBxI")
+CHUNK_HEADER = struct.Struct("<4sI")
+CHUNK_MAGIC = b"CHNK"
+TRAILER = struct.Struct("<QQ8s")
+KEYPOINT_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("first_frame", "<u8"),
+    ("count", "<u4"),
+    ("pad", "<u4"),
+    ("t_start", "<f8"),
+    ("t_end", "<f8")
+])
+
+
+def _chunk_layout(count, keypoint_dtype):
+    """
+    Byte offsets of the arrays of a chunk, relative to the end of its header, and its padded size.
+    """
+    ts_size = count * 8
+    conf_size = count * 4
+    kp_size = count * 33 * 4 * keypoint_dtype.itemsize
+    size = ts_size + conf_size + kp_size
+    return ts_size, ts_size + conf_size, size + (-size % 8)
+
+
+class LandmarkRecorder:
+    """
+    Append-only recorder of per-frame (timestamp, keypoints, confidence) from PoseDetector.
+
+    Frames are buffered and written in chunks of chunk_frames; with quantize=True keypoints
+    are stored as float16 (half the size, ~1e-3 precision on normalized coordinates).
+    Frames without a detected pose are stored as NaN keypoints with confidence 0.
+    """
+    def __init__(self, path, chunk_frames=256, quantize=False, append=False):
+        """
+        - append: continue an existing recording instead of overwriting it
+        """
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self._index = []
+        self.frames = 0
+        self.last_timestamp = -np.inf
+
+        if append and os.path.exists(path):
+            reader = LandmarkRecording(path)
+            self.chunk_frames = reader.chunk_frames
+            flag = reader.dtype_flag
+            self._index = [tuple(entry) for entry in reader.index]
+            self.frames = len(reader)
+            if self.frames:
+                self.last_timestamp = float(reader.index["t_end"][-1])
+            end = reader.data_end
+            reader.close()
+            self._file = open(path, "r+b")
+            self._file.truncate(end)  # drop the old footer, it is rewritten on close
+            self._file.seek(end)
+        else:
+            flag = 1 if quantize else 0
+            self._file = open(path, "wb")
+            self._file.write(HEADER.pack(MAGIC, VERSION, flag, self.chunk_frames))
+
+        self.keypoint_dtype = KEYPOINT_DTYPES[flag]
+        self._timestamps = np.empty(self.chunk_frames, dtype="<f8")
+        self._confidence = np.empty(self.chunk_frames, dtype="<f4")
+        self._keypoints = np.empty((self.chunk_frames, 33, 4), dtype=self.keypoint_dtype)
+        self._buffered = 0
+
+    def append(self, timestamp, keypoints, confidence):
+        """
+        Record one frame; timestamps must not decrease. keypoints may be None (no pose detected).
+        """
+        if timestamp < self.last_timestamp:
+            raise ValueError(f"Timestamps must be non-decreasing ({timestamp} < {self.last_timestamp})")
+        i = self._buffered
+        self._timestamps[i] = timestamp
+        if keypoints is None:
+            self._keypoints[i] = np.nan
+            self._confidence[i] = 0.0
+        else:
+            self._keypoints[i] = keypoints
+            self._confidence[i] = confidence
+        self.last_timestamp = timestamp
+        self._buffered += 1
+        if self._buffered == self.chunk_frames:
+            self.flush()
+
+    def record(self, stream):
+        """
+        Record every item of a PoseDetector.stream() generator while passing it through.
+        """
+        for frame_idx, timestamp, keypoints, confidence in stream:
+            self.append(timestamp, keypoints, confidence)
+            yield frame_idx, timestamp, keypoints, confidence
+
+    def flush(self):
+        """
+        Write the buffered frames as one chunk.
+        """
+        n = self._buffered
+        if not n:
+            return
+        offset = self._file.tell()
+        _, _, padded = _chunk_layout(n, self.keypoint_dtype)
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, n))
+        self._file.write(self._timestamps[:n].tobytes())
+        self._file.write(self._confidence[:n].tobytes())
+        data = self._keypoints[:n].tobytes()
+        self._file.write(data)
+        self._file.write(b"\0" * (padded - n * 12 - len(data)))
+        self._index.append((offset, self.frames, n, 0, self._timestamps[0], self._timestamps[n - 1]))
+        self.frames += n
+        self._buffered = 0
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        index_offset = self._file.tell()
+        self._file.write(np.array(self._index, dtype=INDEX_DTYPE).tobytes())
+        self._file.write(TRAILER.pack(index_offset, len(self._index), END_MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class LandmarkRecording:
+    """
+    Memory-mapped reader for files written by LandmarkRecorder.
+    Chunks are exposed as zero-copy views; time ranges are located through the chunk index.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, flag, chunk_frames = HEADER.unpack(self._mm[:HEADER.size].tobytes())
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a landmark recording")
+        self.dtype_flag = flag
+        self.keypoint_dtype = KEYPOINT_DTYPES[flag]
+        self.chunk_frames = chunk_frames
+        self.index, self.data_end = self._read_index()
+        self._starts = self.index["t_start"]
+        self._first_frames = self.index["first_frame"].astype(np.int64)
+
+    def _read_index(self):
+        size = len(self._mm)
+        if size >= HEADER.size + TRAILER.size:
+            index_offset, n_chunks, end_magic = TRAILER.unpack(self._mm[size - TRAILER.size:].tobytes())
+            if end_magic == END_MAGIC:
+                index = np.frombuffer(self._mm, dtype=INDEX_DTYPE, count=n_chunks, offset=index_offset)
+                return index.copy(), index_offset
+
+        # Unclosed recording: walk the chunk headers (no frame data is read)
+        entries, offset, first = [], HEADER.size, 0
+        while offset + CHUNK_HEADER.size <= size:
+            magic, n = CHUNK_HEADER.unpack(self._mm[offset:offset + CHUNK_HEADER.size].tobytes())
+            _, _, padded = _chunk_layout(n, self.keypoint_dtype)
+            if magic != CHUNK_MAGIC or offset + CHUNK_HEADER.size + padded > size:
+                break
+            ts = np.frombuffer(self._mm, dtype="<f8", count=n, offset=offset + CHUNK_HEADER.size)
+            entries.append((offset, first, n, 0, ts[0], ts[-1]))
+            first += n
+            offset += CHUNK_HEADER.size + padded
+        return np.array(entries, dtype=INDEX_DTYPE), offset
+
+    def __len__(self):
+        return int(self.index["count"].sum())
+
+    @property
+    def duration(self):
+        return float(self.index["t_end"][-1] - self.index["t_start"][0]) if len(self.index) else 0.0
+
+    def chunk(self, i):
+        """
+        Zero-copy views (timestamps, keypoints, confidence) of chunk i.
+        """
+        offset, _, n, _, _, _ = self.index[i]
+        base = int(offset) + CHUNK_HEADER.size
+        conf_offset, kp_offset, _ = _chunk_layout(int(n), self.keypoint_dtype)
+        timestamps = np.frombuffer(self._mm, dtype="<f8", count=n, offset=base)
+        confidence = np.frombuffer(self._mm, dtype="<f4", count=n, offset=base + conf_offset)
+        keypoints = np.frombuffer(self._mm, dtype=self.keypoint_dtype, count=n * 132,
+                                  offset=base + kp_offset).reshape(n, 33, 4)
+        return timestamps, keypoints, confidence
+
+    def iter_chunks(self, start=0, stop=None):
+        """
+        Yield (timestamps, keypoints, confidence) views covering frames [start, stop).
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        first_chunk = np.searchsorted(self._first_frames, start, side="right") - 1
+        for i in range(first_chunk, len(self.index)):
+            chunk_first = int(self._first_frames[i])
+            if chunk_first >= stop:
+                break
+            lo, hi = max(start - chunk_first, 0), min(stop - chunk_first, int(self.index["count"][i]))
+            timestamps, keypoints, confidence = self.chunk(i)
+            yield timestamps[lo:hi], keypoints[lo:hi], confidence[lo:hi]
+
+    def frames(self, start=0, stop=None):
+        """
+        Frames [start, stop) as contiguous arrays: (timestamps f8, keypoints f4/f2 (N, 33, 4), confidence f4).
+        """
+        parts = list(self.iter_chunks(start, stop))
+        if not parts:
+            return np.empty(0), np.empty((0, 33, 4), dtype=self.keypoint_dtype), np.empty(0, dtype=np.float32)
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def frame_range(self, t_start, t_end):
+        """
+        Frame indices [start, stop) with t_start <= timestamp < t_end, using the chunk index
+        so only the chunks at the two boundaries are searched.
+        """
+        def locate(t):
+            i = np.searchsorted(self._starts, t, side="left") - 1
+            if i < 0:
+                return 0
+            timestamps, _, _ = self.chunk(i)
+            return int(self._first_frames[i]) + int(np.searchsorted(timestamps, t, side="left"))
+        return locate(t_start), locate(t_end)
+
+    def slice_time(self, t_start, t_end):
+        return self.frames(*self.frame_range(t_start, t_end))
+
+    def replay(self, angles_ref=None, dirs_ref=None, threshold_deg=10.0, start=0, stop=None):
+        """
+        Re-score the recording chunk by chunk with the batch angle engine, and against a reference
+        when one is given (compare_poses_batch), without running Mediapipe.
+        Yields: (timestamps, angles (n, 8), direction codes (n, 8), fixes structured array or None)
+        """
+        for timestamps, keypoints, confidence in self.iter_chunks(start, stop):
+            angles, directions = compute_angles_and_directions_batch(keypoints)
+            fixes = None
+            if angles_ref is not None:
+                fixes = compare_poses_batch(angles, directions, angles_ref, dirs_ref, threshold_deg)
+            yield timestamps, angles, directions, fixes
+
+    def close(self):
+        """
+        Release the reader's reference to the mapping. Views returned by chunk(), iter_chunks()
+        and replay() keep the mapping alive and stay valid until they are garbage-collected.
+        """
+        self._mm = None
@@ -0,0 +1,97 @@
+import os
+import queue
+import threading
+
+import cv2
+
+from metrics import get_metrics
+
+_CLOSE = object()
+
+
+class AnnotatedImageWriter:
+    """
+    Background thread that draws landmarks on images and encodes them to disk,
+    keeping annotation and PNG encoding off the inference path.
+    """
+    def __init__(self, landmarks_dir, draw_fn, connections, max_queue_size=16, block=True, metrics=None):
+        """
+        - draw_fn / connections: Mediapipe drawing_utils.draw_landmarks and POSE_CONNECTIONS
+        - max_queue_size: number of pending images held in memory
+        - block: when the queue is full, wait for the writer (True) or drop the image (False)
+        - metrics: PipelineMetrics receiving the "draw" and "encode" stage timings (default: process-wide sink)
+        """
+        self.landmarks_dir = landmarks_dir
+        self.draw_fn = draw_fn
+        self.connections = connections
+        self.block = block
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="AnnotatedImageWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, image, pose_landmarks, image_name):
+        """
+        Queue an image for annotation. Returns False if it was dropped because the queue is full.
+        The image must not be modified by the caller afterwards.
+        """
+        if self._closed:
+            raise RuntimeError("AnnotatedImageWriter is closed")
+        job = (image, pose_landmarks, image_name)
+        if self.block:
+            self._queue.put(job)
+            return True
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def flush(self):
+        """
+        Block until every queued image has been written.
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Write the remaining images and stop the writer thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _CLOSE:
+                    return
+                self._write(*job)
+            except Exception as e:
+                self.failed += 1
+                print(f"Failed to save landmarked image {job[2]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, image, pose_landmarks, image_name):
+        with self.metrics.stage("draw"):
+            annotated_image = image.copy()
+            self.draw_fn(annotated_image, pose_landmarks, self.connections)
+
+        output_path = os.path.join(self.landmarks_dir, f"landmarks_{image_name}")
+        with self.metrics.stage("encode"):
+            saved = cv2.imwrite(output_path, annotated_image)
+        if saved:
+            self.written += 1
+            print(f"Landmarked image saved at: {output_path}")
+        else:
+            self.failed += 1
+            print(f"Failed to save landmarked image at: {output_path}")
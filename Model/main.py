@@ -1,7 +1,7 @@
-import json
 from pose_detector import PoseDetector
-from pose_utils import compute_all_angles, compute_all_angle_directions, compare_poses
+from pose_utils import compute_all_angles_and_directions, compare_poses
 from feature_extractor import FeatureExtractor
+from reference_index import ReferenceIndex
 
 detector = PoseDetector()
 extractor = FeatureExtractor()
@@ -9,21 +9,19 @@ extractor = FeatureExtractor()
 image_filename = "1.png"
 results, keypoints, confidence = detector.detect_pose(image_filename)
 
-angles = compute_all_angles(results)
-directions = compute_all_angle_directions(results)
+angles, directions = compute_all_angles_and_directions(results)
 
 features = extractor.extract_features(keypoints, angles)
 
 pose_name = "downward_dog"
 
-with open(f"Model/json_reference/{pose_name}_reference.json", "r") as f:
-    ref_data = json.load(f)
-angles_ref = ref_data["angles"]
-directions_ref = ref_data["directions"]
+references = ReferenceIndex()
+angles_ref, directions_ref = references.reference(pose_name)
 
 print("Detection confidence:", confidence)
 print("Computed angles:", angles)
 print("Computed angle directions:", directions)
+print("Closest reference poses:", references.rank(angles, directions, top_k=3))
 
 print("\n### Coach feedback compared to reference ###")
 fixes = compare_poses(angles, angles_ref, directions, directions_ref)
@@ -36,3 +34,5 @@ else:
 
 print("\nFeature vector length:", len(features))
 print("First 10 features:", features[:10])
+
+detector.close()
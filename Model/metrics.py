@@ -0,0 +1,204 @@
+import bisect
+import contextlib
+import functools
+import os
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_NOOP = contextlib.nullcontext()
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class PipelineMetrics:
+    """
+    Per-stage latency histograms and event counters for the detection/coaching pipeline.
+    When disabled, stage() returns a shared no-op context and inc()/observe() return immediately.
+    """
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS, low_confidence_threshold=0.5, prefix="pose_pipeline"):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.low_confidence_threshold = low_confidence_threshold
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        # stage -> [bucket counts (len(buckets) + 1), sum, count]
+        self._histograms = {}
+        self._counters = {"frames": 0, "detection_failures": 0, "low_confidence_frames": 0, "dropped_frames": 0}
+
+    def drain(self):
+        """
+        Return the raw histograms and counters recorded since the last drain and reset them,
+        e.g. to ship a worker process's metrics to its parent (see merge).
+        """
+        with self._lock:
+            state = {"buckets": self.buckets, "histograms": self._histograms, "counters": self._counters}
+            self._clear()
+        return state
+
+    def merge(self, state):
+        """
+        Add the raw state returned by another registry's drain() to this one.
+        """
+        if tuple(state["buckets"]) != self.buckets:
+            raise ValueError("Cannot merge metrics recorded with different histogram buckets")
+        with self._lock:
+            for name, amount in state["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + amount
+            for name, (counts, total, count) in state["histograms"].items():
+                hist = self._histograms.get(name)
+                if hist is None:
+                    hist = self._histograms[name] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                hist[0] = [a + b for a, b in zip(hist[0], counts)]
+                hist[1] += total
+                hist[2] += count
+
+    def stage(self, name):
+        """
+        Context manager timing one pipeline stage: `with metrics.stage("inference"): ...`
+        """
+        return _StageTimer(self, name) if self.enabled else _NOOP
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            hist[0][bisect.bisect_left(self.buckets, seconds)] += 1
+            hist[1] += seconds
+            hist[2] += 1
+
+    def inc(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def record_detection(self, confidence, detected=True):
+        """
+        Count one processed frame, and whether it failed or had low confidence.
+        """
+        if not self.enabled:
+            return
+        self.inc("frames")
+        if not detected:
+            self.inc("detection_failures")
+        elif confidence < self.low_confidence_threshold:
+            self.inc("low_confidence_frames")
+
+    def snapshot(self):
+        """
+        Returns: {"counters": {...}, "stages": {stage: {"count", "sum_s", "mean_s", "buckets": {le: cumulative count}}}}
+        """
+        with self._lock:
+            stages = {}
+            for name, (counts, total, count) in self._histograms.items():
+                cumulative, running = {}, 0
+                for bound, c in zip(self.buckets + (float("inf"),), counts):
+                    running += c
+                    cumulative[bound] = running
+                stages[name] = {
+                    "count": count,
+                    "sum_s": total,
+                    "mean_s": total / count if count else 0.0,
+                    "buckets": cumulative
+                }
+            return {"counters": dict(self._counters), "stages": stages}
+
+    def to_prometheus(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap["counters"].items()):
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+
+        metric = f"{self.prefix}_stage_latency_seconds"
+        if snap["stages"]:
+            lines.append(f"# HELP {metric} Latency of each pipeline stage.")
+            lines.append(f"# TYPE {metric} histogram")
+        for stage, data in sorted(snap["stages"].items()):
+            for bound, count in data["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {data["sum_s"]}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {data["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Atomically write the exposition text, e.g. for a node_exporter textfile collector.
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+# Process-wide default used by PoseDetector and pose_utils; disabled until enable_metrics()
+METRICS = PipelineMetrics()
+_active = METRICS
+
+
+def get_metrics():
+    """
+    The process-wide sink: stages timed with @timed and PoseDetectors built without metrics= report here.
+    """
+    return _active
+
+
+def set_metrics(metrics):
+    """
+    Make `metrics` the process-wide sink, so a whole detection + coaching cycle lands in one registry.
+    """
+    global _active
+    _active = metrics
+    return metrics
+
+
+def enable_metrics(enabled=True):
+    _active.enabled = enabled
+    return _active
+
+
+def timed(stage):
+    """
+    Decorator timing every call of a function as `stage` on the process-wide sink (see set_metrics).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            metrics = _active
+            if not metrics.enabled:
+                return fn(*args, **kwargs)
+            with metrics.stage(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,13 +1,58 @@
-import cv2
-import mediapipe as mp
+import atexit
 import numpy as np
 import os
+import queue
+import threading
+import time
+from types import SimpleNamespace
+from metrics import get_metrics, set_metrics
+
+# cv2 and Mediapipe are heavy; they are imported on first PoseDetector construction
+cv2 = None
+mp = None
+landmark_pb2 = None
+
+_STREAM_END = object()
+
+def _import_backends():
+    global cv2, mp, landmark_pb2
+    if landmark_pb2 is None:
+        import cv2
+        import mediapipe as mp
+        from mediapipe.framework.formats import landmark_pb2
 
 class PoseDetector:
-    def __init__(self, static_image_mode=True, model_complexity=1, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+    def __init__(self, static_image_mode=True, model_complexity=1, min_detection_confidence=0.5, min_tracking_confidence=0.5, cache=None,
+                 render_every=1, async_render=True, render_queue_size=16, drop_renders=False, metrics=None,
+                 preprocessor=None):
         """
         Initialize Mediapipe Pose model with given parameters.
+        - cache: optional LandmarkCache; detect_pose then skips inference for images it has already seen
+        - render_every: save an annotated image for every Nth detection (0 = only on demand)
+        - async_render: annotate and encode on a background writer thread instead of inline
+        - render_queue_size / drop_renders: writer queue bound, and whether to drop images
+          instead of blocking detect_pose when it is full
+        - metrics: PipelineMetrics receiving per-stage timings (default: the process-wide sink,
+          metrics.get_metrics()); a custom one is installed as the process-wide sink so the
+          angles/feedback stages timed in pose_utils are recorded in the same registry
+        - preprocessor: optional preprocess.FramePreprocessor that downscales frames (and, in stream(),
+          crops them around the tracked pose) before inference; keypoints are returned in full-frame coordinates
         """
+        _import_backends()
+        self.metrics = set_metrics(metrics) if metrics is not None else get_metrics()
+        self.cache = cache
+        self.preprocessor = preprocessor
+        self.render_every = render_every
+        self.async_render = async_render
+        self.render_queue_size = render_queue_size
+        self.drop_renders = drop_renders
+        self.writer = None  # created on first asynchronous render
+        self._detections = 0
+        self.static_image_mode = static_image_mode
+        self.model_complexity = model_complexity
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+
         self.mp_pose = mp.solutions.pose
         self.pose = self.mp_pose.Pose(
             static_image_mode = static_image_mode,
@@ -16,6 +61,8 @@ class PoseDetector:
             min_tracking_confidence = min_tracking_confidence
         )
         self.mp_drawing = mp.solutions.drawing_utils
+        self.tracking_pose = None  # created on first stream() call
+        self.dropped_frames = 0  # frames discarded by the last stream()
 
         # Define directories
         self.images_dir = os.path.join(os.path.dirname(__file__), "Images")
@@ -25,33 +72,188 @@ class PoseDetector:
         os.makedirs(self.images_dir, exist_ok=True)
         os.makedirs(self.landmarks_dir, exist_ok=True)
 
-    def detect_pose(self, image_name):
+    def detect_pose(self, image_name, save_landmarks=None):
         """
         Detect pose landmarks from an image in IMAGES folder.
+        save_landmarks: True/False forces/skips the annotated image, None follows render_every.
         Returns:
+            results: Mediapipe results (None if no pose was found)
             keypoints: numpy array of shape (33, 4) [x, y, z, visibility]
             confidence: average visibility score
         """
         image_path = os.path.join(self.images_dir, image_name)
-        image = cv2.imread(image_path)
-        if image is None:
-            raise FileNotFoundError(f"Image {image_name} not found in IMAGES directory.")
+        if save_landmarks is None:
+            save_landmarks = self.render_every > 0 and self._detections % self.render_every == 0
+        self._detections += 1
+
+        if self.cache is not None:
+            results, keypoints, confidence = self._detect_pose_cached(image_path, image_name, save_landmarks)
+        elif self.preprocessor is not None and not save_landmarks:
+            # Nothing to draw on, so the image may be decoded at reduced resolution
+            try:
+                with self.metrics.stage("read"):
+                    with open(image_path, "rb") as f:
+                        data = f.read()
+            except OSError:
+                raise FileNotFoundError(f"Image {image_name} not found in IMAGES directory.")
+            with self.metrics.stage("decode"):
+                image = self._decode(data, image_name, reduced=True)
+            results, keypoints, confidence = self._process_image(image, image_name, save_landmarks)
+        else:
+            with self.metrics.stage("decode"):
+                image = cv2.imread(image_path)
+            if image is None:
+                raise FileNotFoundError(f"Image {image_name} not found in IMAGES directory.")
+            results, keypoints, confidence = self._process_image(image, image_name, save_landmarks)
+
+        self.metrics.record_detection(confidence, results is not None)
+        return results, keypoints, confidence
+
+    def detect_bytes(self, data, image_name="frame.png", save_landmarks=False):
+        """
+        Detect pose landmarks from an encoded image (PNG/JPEG bytes), e.g. received over the network.
+        Returns the same (results, keypoints, confidence) tuple as detect_pose.
+        """
+        with self.metrics.stage("decode"):
+            try:
+                image = self._decode(data, image_name, reduced=not save_landmarks)
+            except FileNotFoundError:
+                raise ValueError("Could not decode image data.")
+        results, keypoints, confidence = self._process_image(image, image_name, save_landmarks)
+        self.metrics.record_detection(confidence, results is not None)
+        return results, keypoints, confidence
 
-        # Convert to RGB for Mediapipe
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(image_rgb)
+    def _process_image(self, image, image_name, save_landmarks, pose=None, roi=None):
+        metrics = self.metrics
+        pose = pose if pose is not None else self.pose
+        # Convert to RGB for Mediapipe (after cropping/downscaling, with a preprocessor)
+        transform = None
+        with metrics.stage("color_convert"):
+            if self.preprocessor is None:
+                image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            else:
+                image_rgb, transform = self.preprocessor.prepare(image, roi)
+        with metrics.stage("inference"):
+            results = pose.process(image_rgb)
 
         if not results.pose_landmarks:
-            return None, 0.0
+            return None, None, 0.0
 
-        keypoints = self.extract_keypoints(results)
-        confidence = np.mean(keypoints[:, 3])  # average visibility
+        with metrics.stage("keypoints"):
+            keypoints = self.extract_keypoints(results)
+            if transform is not None and not self.preprocessor.is_identity(transform):
+                # Landmarks are relative to the ROI; bring them (and results) back to the full frame
+                keypoints = self.preprocessor.to_original(keypoints, transform)
+                results = self.keypoints_to_results(keypoints)
+            confidence = np.mean(keypoints[:, 3])  # average visibility
 
         # Save image with landmarks drawn
-        self.draw_landmarks(image, results, image_name)
+        if save_landmarks:
+            with metrics.stage("render"):
+                self.render(image, results, image_name)
 
         return results, keypoints, confidence
 
+    def _detect_pose_cached(self, image_path, image_name, save_landmarks):
+        """
+        detect_pose through the landmark cache: hash the encoded file, decode and infer only on a miss.
+        """
+        try:
+            with self.metrics.stage("read"):
+                with open(image_path, "rb") as f:
+                    data = f.read()
+        except OSError:
+            raise FileNotFoundError(f"Image {image_name} not found in IMAGES directory.")
+
+        key = self.cache.make_key(data, self.cache_params())
+        cached = self.cache.get(key)
+        if cached is not None:
+            keypoints, confidence = cached
+            if keypoints is None:
+                return None, None, 0.0
+            results = self.keypoints_to_results(keypoints)
+            if save_landmarks:
+                with self.metrics.stage("render"):
+                    self.render(self._decode(data, image_name), results, image_name)
+            return results, keypoints, np.float64(confidence)
+
+        with self.metrics.stage("decode"):
+            image = self._decode(data, image_name, reduced=not save_landmarks)
+        results, keypoints, confidence = self._process_image(image, image_name, save_landmarks)
+        self.cache.put(key, keypoints, confidence)
+        return results, keypoints, confidence
+
+    def _decode(self, data, image_name, reduced=False):
+        if reduced and self.preprocessor is not None:
+            image = self.preprocessor.decode(data)
+        else:
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise FileNotFoundError(f"Image {image_name} not found in IMAGES directory.")
+        return image
+
+    def cache_params(self):
+        """
+        Detector parameters that affect the landmarks, used as part of the cache key.
+        """
+        params = {
+            "static_image_mode": self.static_image_mode,
+            "model_complexity": self.model_complexity,
+            "min_detection_confidence": self.min_detection_confidence,
+            "min_tracking_confidence": self.min_tracking_confidence
+        }
+        if self.preprocessor is not None:
+            params["target_size"] = self.preprocessor.target_size
+        return params
+
+    def calibrate_model_complexity(self, sample_image, latency_budget_ms, runs=3):
+        """
+        Pick the most accurate model_complexity (2, 1, then 0) whose median inference time on
+        sample_image (a BGR frame) fits latency_budget_ms, and switch this detector to it.
+        Returns the chosen model_complexity.
+        """
+        if self.preprocessor is not None:
+            image_rgb, _ = self.preprocessor.prepare(sample_image)
+        else:
+            image_rgb = cv2.cvtColor(sample_image, cv2.COLOR_BGR2RGB)
+
+        for complexity in (2, 1, 0):
+            pose = self.mp_pose.Pose(
+                static_image_mode = self.static_image_mode,
+                model_complexity = complexity,
+                min_detection_confidence = self.min_detection_confidence,
+                min_tracking_confidence = self.min_tracking_confidence
+            )
+            pose.process(image_rgb)  # warm-up
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                pose.process(image_rgb)
+                timings.append((time.perf_counter() - start) * 1000.0)
+            if complexity == 0 or sorted(timings)[len(timings) // 2] <= latency_budget_ms:
+                break
+            pose.close()
+
+        self.pose.close()
+        self.pose = pose
+        self.model_complexity = complexity
+        if self.tracking_pose is not None:
+            self.tracking_pose.close()
+        self.tracking_pose = None  # recreated with the new complexity on the next stream()
+        return complexity
+
+    @staticmethod
+    def keypoints_to_results(keypoints):
+        """
+        Wrap a (33, 4) keypoint array in a Mediapipe-like results object
+        (usable by compute_all_angles and draw_landmarks).
+        """
+        _import_backends()
+        landmark_list = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z, visibility in keypoints:
+            landmark_list.landmark.add(x=x, y=y, z=z, visibility=visibility)
+        return SimpleNamespace(pose_landmarks=landmark_list)
+
     def extract_keypoints(self, results):
         """
         Extract keypoints from Mediapipe results.
@@ -61,17 +263,213 @@ class PoseDetector:
         keypoints = np.array([[lm.x, lm.y, lm.z, lm.visibility] for lm in landmarks])
         return keypoints
 
+    def render(self, image, results, image_name):
+        """
+        Save an annotated copy of image, on the background writer when async_render is set.
+        """
+        if not self.async_render:
+            self.draw_landmarks(image, results, image_name)
+            return
+        if self.writer is None:
+            from landmark_writer import AnnotatedImageWriter
+            self.writer = AnnotatedImageWriter(
+                self.landmarks_dir,
+                self.mp_drawing.draw_landmarks,
+                self.mp_pose.POSE_CONNECTIONS,
+                max_queue_size=self.render_queue_size,
+                block=not self.drop_renders,
+                metrics=self.metrics
+            )
+            atexit.register(self.writer.close)
+        self.writer.submit(image, results.pose_landmarks, image_name)
+
+    def flush_renders(self):
+        """
+        Wait until every queued annotated image has been written.
+        """
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        """
+        Finish pending annotated images and stop the writer thread.
+        """
+        if self.writer is not None:
+            self.writer.close()
+            atexit.unregister(self.writer.close)
+            self.writer = None
+
     def draw_landmarks(self, image, results, image_name):
         """
         Draw landmarks on image and save it into LANDMARKS folder.
         """
-        annotated_image = image.copy()
-        self.mp_drawing.draw_landmarks(
-            annotated_image,
-            results.pose_landmarks,
-            self.mp_pose.POSE_CONNECTIONS
-        )
+        with self.metrics.stage("draw"):
+            annotated_image = image.copy()
+            self.mp_drawing.draw_landmarks(
+                annotated_image,
+                results.pose_landmarks,
+                self.mp_pose.POSE_CONNECTIONS
+            )
 
         output_path = os.path.join(self.landmarks_dir, f"landmarks_{image_name}")
-        cv2.imwrite(output_path, annotated_image)
+        with self.metrics.stage("encode"):
+            cv2.imwrite(output_path, annotated_image)
         print(f"Landmarked image saved at: {output_path}")
+
+    def stream(self, source, frame_skip=0, max_queue_size=8, drop_oldest=None):
+        """
+        Run pose detection over a video file, camera index or cv2.VideoCapture.
+        Frames are decoded on a background thread into a bounded queue and processed
+        with Mediapipe in tracking mode (static_image_mode=False).
+        - frame_skip: process one frame out of every (frame_skip + 1)
+        - max_queue_size: number of decoded frames buffered ahead of inference
+        - drop_oldest: when the queue is full, discard the oldest frame instead of
+          blocking the capture thread (keeps latency bounded on live feeds).
+          None (default) drops only for live cameras; video files are read without loss.
+          Dropped frames are counted in self.dropped_frames and the "dropped_frames" metric.
+
+        Yields:
+            (frame_idx, timestamp, keypoints, confidence)
+            keypoints is None and confidence 0.0 when no pose is found in the frame
+        Errors raised by the capture thread are re-raised here after the last decoded frame.
+        """
+        # Anything that is not a path or camera index is used as an already-open capture
+        owns_capture = isinstance(source, (str, int, os.PathLike))
+        capture = cv2.VideoCapture(source) if owns_capture else source
+        if not capture.isOpened():
+            raise FileNotFoundError(f"Video source {source} could not be opened.")
+
+        # Video files carry their own clock; live cameras report no frame count
+        has_clock = capture.get(cv2.CAP_PROP_FRAME_COUNT) > 0
+        if drop_oldest is None:
+            drop_oldest = not has_clock
+
+        if self.tracking_pose is None:
+            self.tracking_pose = self.mp_pose.Pose(
+                static_image_mode = False,
+                model_complexity = self.model_complexity,
+                min_detection_confidence = self.min_detection_confidence,
+                min_tracking_confidence = self.min_tracking_confidence
+            )
+        else:
+            # A new source must not inherit the previous stream's tracking state (or crop)
+            self.tracking_pose.reset()
+
+        frames = queue.Queue(maxsize=max_queue_size)
+        stop = threading.Event()
+        state = SimpleNamespace(dropped=0, error=None)
+        self.dropped_frames = 0
+        reader = threading.Thread(
+            target=self._read_frames,
+            args=(capture, frames, stop, frame_skip, drop_oldest, has_clock, state, self.metrics),
+            daemon=True
+        )
+        reader.start()
+
+        roi = None  # crop fed to the tracking graph, None = full frame
+        try:
+            while True:
+                item = frames.get()
+                self.dropped_frames = state.dropped
+                if item is _STREAM_END:
+                    if state.error is not None:
+                        raise state.error
+                    break
+                frame_idx, timestamp, frame = item
+                _, keypoints, confidence = self._process_image(frame, None, False, pose=self.tracking_pose, roi=roi)
+                if self.preprocessor is not None:
+                    roi = self._update_stream_roi(roi, keypoints, frame.shape)
+                if keypoints is None:
+                    self.metrics.record_detection(0.0, detected=False)
+                    yield frame_idx, timestamp, None, 0.0
+                    continue
+                confidence = float(confidence)
+                self.metrics.record_detection(confidence)
+                yield frame_idx, timestamp, keypoints, confidence
+        finally:
+            stop.set()
+            # Unblock a reader waiting on a full queue
+            while reader.is_alive():
+                try:
+                    frames.get_nowait()
+                except queue.Empty:
+                    pass
+                reader.join(timeout=0.05)
+            self.dropped_frames = state.dropped
+            if owns_capture:
+                capture.release()
+
+    def _update_stream_roi(self, roi, keypoints, frame_shape):
+        """
+        Crop for the next stream frame. Mediapipe's tracking graph keeps its own ROI, normalized to
+        the previous input image, so the crop must stay fixed while the graph tracks the pose:
+        it falls back to the full frame when tracking is lost (the graph re-detects then anyway),
+        and moves only when the pose is first found or leaves it, resetting the graph.
+        """
+        if keypoints is None:
+            return None
+        height, width = frame_shape[:2]
+        if roi is not None and self.preprocessor.contains_pose(roi, keypoints, width, height):
+            return roi
+        new_roi = self.preprocessor.roi_from_keypoints(keypoints, width, height)
+        if new_roi != roi:
+            self.tracking_pose.reset()
+        return new_roi
+
+    @staticmethod
+    def _read_frames(capture, frames, stop, frame_skip, drop_oldest, has_clock, state, metrics):
+        """
+        Capture thread: decode frames and push (frame_idx, timestamp, frame) into the queue.
+        Always ends with _STREAM_END; an exception is stored in state.error for the consumer.
+        """
+        def drop_one():
+            try:
+                frames.get_nowait()
+            except queue.Empty:
+                return
+            state.dropped += 1
+            metrics.inc("dropped_frames")
+
+        try:
+            start = time.monotonic()
+            frame_idx = -1
+            while not stop.is_set():
+                with metrics.stage("decode"):
+                    ok, frame = capture.read()
+                if not ok:
+                    break
+                frame_idx += 1
+                if frame_skip and frame_idx % (frame_skip + 1):
+                    continue
+
+                if has_clock:
+                    timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                else:
+                    timestamp = time.monotonic() - start
+
+                item = (frame_idx, timestamp, frame)
+                if drop_oldest:
+                    while True:
+                        try:
+                            frames.put_nowait(item)
+                            break
+                        except queue.Full:
+                            drop_one()
+                else:
+                    while not stop.is_set():
+                        try:
+                            frames.put(item, timeout=0.1)
+                            break
+                        except queue.Full:
+                            pass
+        except Exception as e:
+            state.error = e
+        finally:
+            # The end marker must always get through, even if the consumer is slow
+            while not stop.is_set():
+                try:
+                    frames.put(_STREAM_END, timeout=0.1)
+                    break
+                except queue.Full:
+                    if drop_oldest:
+                        drop_one()
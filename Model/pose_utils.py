@@ -1,7 +1,46 @@
+import math
 import numpy as np
-import mediapipe as mp
+from enum import IntEnum
+from metrics import timed
 
-mp_pose = mp.solutions.pose
+class PoseLandmark(IntEnum):
+    """
+    Mediapipe Pose landmark indices (same values as mp.solutions.pose.PoseLandmark),
+    kept here so the geometry/coaching code does not need to import Mediapipe.
+    """
+    NOSE = 0
+    LEFT_EYE_INNER = 1
+    LEFT_EYE = 2
+    LEFT_EYE_OUTER = 3
+    RIGHT_EYE_INNER = 4
+    RIGHT_EYE = 5
+    RIGHT_EYE_OUTER = 6
+    LEFT_EAR = 7
+    RIGHT_EAR = 8
+    MOUTH_LEFT = 9
+    MOUTH_RIGHT = 10
+    LEFT_SHOULDER = 11
+    RIGHT_SHOULDER = 12
+    LEFT_ELBOW = 13
+    RIGHT_ELBOW = 14
+    LEFT_WRIST = 15
+    RIGHT_WRIST = 16
+    LEFT_PINKY = 17
+    RIGHT_PINKY = 18
+    LEFT_INDEX = 19
+    RIGHT_INDEX = 20
+    LEFT_THUMB = 21
+    RIGHT_THUMB = 22
+    LEFT_HIP = 23
+    RIGHT_HIP = 24
+    LEFT_KNEE = 25
+    RIGHT_KNEE = 26
+    LEFT_ANKLE = 27
+    RIGHT_ANKLE = 28
+    LEFT_HEEL = 29
+    RIGHT_HEEL = 30
+    LEFT_FOOT_INDEX = 31
+    RIGHT_FOOT_INDEX = 32
 
 ANGLE_NAMES = [
     "left_elbow_angle",
@@ -15,18 +54,18 @@ ANGLE_NAMES = [
 ]
 
 LANDMARK_MAP = {
-    "left_shoulder": mp_pose.PoseLandmark.LEFT_SHOULDER,
-    "right_shoulder": mp_pose.PoseLandmark.RIGHT_SHOULDER,
-    "left_elbow": mp_pose.PoseLandmark.LEFT_ELBOW,
-    "right_elbow": mp_pose.PoseLandmark.RIGHT_ELBOW,
-    "left_wrist": mp_pose.PoseLandmark.LEFT_WRIST,
-    "right_wrist": mp_pose.PoseLandmark.RIGHT_WRIST,
-    "left_hip": mp_pose.PoseLandmark.LEFT_HIP,
-    "right_hip": mp_pose.PoseLandmark.RIGHT_HIP,
-    "left_knee": mp_pose.PoseLandmark.LEFT_KNEE,
-    "right_knee": mp_pose.PoseLandmark.RIGHT_KNEE,
-    "left_ankle": mp_pose.PoseLandmark.LEFT_ANKLE,
-    "right_ankle": mp_pose.PoseLandmark.RIGHT_ANKLE
+    "left_shoulder": PoseLandmark.LEFT_SHOULDER,
+    "right_shoulder": PoseLandmark.RIGHT_SHOULDER,
+    "left_elbow": PoseLandmark.LEFT_ELBOW,
+    "right_elbow": PoseLandmark.RIGHT_ELBOW,
+    "left_wrist": PoseLandmark.LEFT_WRIST,
+    "right_wrist": PoseLandmark.RIGHT_WRIST,
+    "left_hip": PoseLandmark.LEFT_HIP,
+    "right_hip": PoseLandmark.RIGHT_HIP,
+    "left_knee": PoseLandmark.LEFT_KNEE,
+    "right_knee": PoseLandmark.RIGHT_KNEE,
+    "left_ankle": PoseLandmark.LEFT_ANKLE,
+    "right_ankle": PoseLandmark.RIGHT_ANKLE
 }
 
 def calculate_angle(pA, pB, pC):
@@ -42,27 +81,6 @@ def safe_calculate_angle(pA, pB, pC):
     except Exception:
         return None
 
-def compute_all_angles(results):
-    if results is None or not hasattr(results, "pose_landmarks") or results.pose_landmarks is None:
-        return {name: None for name in ANGLE_NAMES}
-    lm = results.pose_landmarks.landmark
-    def get_point(name):
-        if name not in LANDMARK_MAP:
-            return None
-        idx = LANDMARK_MAP[name].value
-        landmark = lm[idx]
-        return (landmark.x, landmark.y)
-    return {
-        "left_elbow_angle": safe_calculate_angle(get_point("left_shoulder"), get_point("left_elbow"), get_point("left_wrist")),
-        "right_elbow_angle": safe_calculate_angle(get_point("right_shoulder"), get_point("right_elbow"), get_point("right_wrist")),
-        "left_shoulder_angle": safe_calculate_angle(get_point("left_elbow"), get_point("left_shoulder"), get_point("left_hip")),
-        "right_shoulder_angle": safe_calculate_angle(get_point("right_elbow"), get_point("right_shoulder"), get_point("right_hip")),
-        "left_knee_angle": safe_calculate_angle(get_point("left_hip"), get_point("left_knee"), get_point("left_ankle")),
-        "right_knee_angle": safe_calculate_angle(get_point("right_hip"), get_point("right_knee"), get_point("right_ankle")),
-        "left_hip_angle": safe_calculate_angle(get_point("left_shoulder"), get_point("left_hip"), get_point("left_knee")),
-        "right_hip_angle": safe_calculate_angle(get_point("right_shoulder"), get_point("right_hip"), get_point("right_knee")),
-    }
-
 def get_angle_direction(a, b, c):
     if a is None or b is None or c is None:
         return None
@@ -84,26 +102,160 @@ def get_angle_direction(a, b, c):
         if dx < 0 and dy > 0: return "down-left"
         return "up-left"
 
-def compute_all_angle_directions(results):
+# === BATCH ENGINE ===
+# (proximal, vertex, distal) landmark triplet for every entry of ANGLE_NAMES
+ANGLE_TRIPLETS = [
+    ("left_shoulder", "left_elbow", "left_wrist"),
+    ("right_shoulder", "right_elbow", "right_wrist"),
+    ("left_elbow", "left_shoulder", "left_hip"),
+    ("right_elbow", "right_shoulder", "right_hip"),
+    ("left_hip", "left_knee", "left_ankle"),
+    ("right_hip", "right_knee", "right_ankle"),
+    ("left_shoulder", "left_hip", "left_knee"),
+    ("right_shoulder", "right_hip", "right_knee")
+]
+
+TRIPLET_INDICES = np.array(
+    [[LANDMARK_MAP[name].value for name in triplet] for triplet in ANGLE_TRIPLETS],
+    dtype=np.intp
+)
+
+# Direction codes used by the batch API; DIRECTION_MISSING decodes to None
+DIRECTION_MISSING = -1
+DIRECTION_NAMES = ("undefined", "up", "down", "left", "right", "up-right", "up-left", "down-right", "down-left")
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTION_NAMES)}
+
+def _as_keypoint_batch(keypoints):
+    kp = np.asarray(keypoints, dtype=np.float64)
+    if kp.ndim == 2:
+        kp = kp[np.newaxis]
+    if kp.ndim != 3 or kp.shape[1:] != (33, 4):
+        raise ValueError(f"Expected keypoints of shape (N, 33, 4) or (33, 4), got {kp.shape}")
+    return kp
+
+@timed("angles")
+def compute_angles_and_directions_batch(keypoints, min_visibility=0.0):
+    """
+    Compute all joint angles and direction codes for a batch of frames.
+    - keypoints: array (N, 33, 4) [x, y, z, visibility], or a single (33, 4) frame
+    - min_visibility: joints whose triplet has a landmark below this visibility are masked
+
+    Returns:
+        angles: float64 array (N, 8) in ANGLE_NAMES order, NaN where undefined or masked
+        directions: int8 array (N, 8) of DIRECTION_NAMES codes, DIRECTION_MISSING where masked
+    """
+    kp = _as_keypoint_batch(keypoints)
+    pts = kp[:, TRIPLET_INDICES, :2]           # (N, 8, 3, 2)
+    vis = kp[:, TRIPLET_INDICES, 3]            # (N, 8, 3)
+    missing = ~np.isfinite(pts).all(axis=(-1, -2)) | (vis < min_visibility).any(axis=-1)
+
+    ba = pts[:, :, 0] - pts[:, :, 1]
+    bc = pts[:, :, 2] - pts[:, :, 1]
+    norm_ba = np.sqrt(np.einsum("nji,nji->nj", ba, ba))
+    norm_bc = np.sqrt(np.einsum("nji,nji->nj", bc, bc))
+    degenerate = (norm_ba == 0) | (norm_bc == 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cosine = np.einsum("nji,nji->nj", ba, bc) / (norm_ba * norm_bc)
+        angles = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+        unit_sum = ba / norm_ba[..., np.newaxis] + bc / norm_bc[..., np.newaxis]
+    angles[missing] = np.nan
+
+    dx, dy = unit_sum[..., 0], unit_sum[..., 1]
+    adx, ady = np.abs(dx), np.abs(dy)
+    codes = np.select(
+        [
+            degenerate | ((dx == 0) & (dy == 0)),
+            (adx > ady) & (dx > 0),
+            adx > ady,
+            (ady > adx) & (dy > 0),
+            ady > adx,
+            (dx > 0) & (dy > 0),
+            (dx > 0) & (dy < 0),
+            (dx < 0) & (dy > 0)
+        ],
+        [
+            DIRECTION_CODES["undefined"],
+            DIRECTION_CODES["right"],
+            DIRECTION_CODES["left"],
+            DIRECTION_CODES["down"],
+            DIRECTION_CODES["up"],
+            DIRECTION_CODES["down-right"],
+            DIRECTION_CODES["up-right"],
+            DIRECTION_CODES["down-left"]
+        ],
+        default=DIRECTION_CODES["up-left"]
+    ).astype(np.int8)
+    codes[missing] = DIRECTION_MISSING
+    return angles, codes
+
+def results_to_keypoints(results):
+    """
+    Convert Mediapipe results into a (33, 4) keypoint array, or None if no pose was found.
+    """
     if results is None or not hasattr(results, "pose_landmarks") or results.pose_landmarks is None:
-        return {name: None for name in ANGLE_NAMES}
+        return None
+    return np.array([[lm.x, lm.y, lm.z, lm.visibility] for lm in results.pose_landmarks.landmark])
+
+def angles_to_dict(angles_row):
+    return {name: (None if np.isnan(v) else float(v)) for name, v in zip(ANGLE_NAMES, angles_row)}
+
+def directions_to_dict(codes_row):
+    return {name: (None if c == DIRECTION_MISSING else DIRECTION_NAMES[c]) for name, c in zip(ANGLE_NAMES, codes_row)}
+
+def angles_from_dict(angles):
+    return np.array([np.nan if angles.get(name) is None else angles[name] for name in ANGLE_NAMES], dtype=np.float64)
+
+def directions_from_dict(directions):
+    return np.array([DIRECTION_CODES.get(directions.get(name), DIRECTION_MISSING) for name in ANGLE_NAMES], dtype=np.int8)
+
+# Landmark indices of each triplet as plain ints, for the single-frame path
+_TRIPLET_LANDMARKS = [tuple(int(i) for i in row) for row in TRIPLET_INDICES]
+
+@timed("angles")
+def compute_all_angles_and_directions(results):
+    """
+    Angles and direction names of one Mediapipe result, as (angles dict, directions dict).
+    Same values as compute_angles_and_directions_batch, computed with scalar math on the
+    12 landmarks involved: for a single frame this is much cheaper than building a (1, 33, 4) batch.
+    """
+    if results is None or getattr(results, "pose_landmarks", None) is None:
+        return {name: None for name in ANGLE_NAMES}, {name: None for name in ANGLE_NAMES}
     lm = results.pose_landmarks.landmark
-    def get_point(name):
-        if name not in LANDMARK_MAP:
-            return None
-        idx = LANDMARK_MAP[name].value
-        landmark = lm[idx]
-        return (landmark.x, landmark.y)
-    return {
-        "left_elbow_angle": get_angle_direction(get_point("left_shoulder"), get_point("left_elbow"), get_point("left_wrist")),
-        "right_elbow_angle": get_angle_direction(get_point("right_shoulder"), get_point("right_elbow"), get_point("right_wrist")),
-        "left_shoulder_angle": get_angle_direction(get_point("left_elbow"), get_point("left_shoulder"), get_point("left_hip")),
-        "right_shoulder_angle": get_angle_direction(get_point("right_elbow"), get_point("right_shoulder"), get_point("right_hip")),
-        "left_knee_angle": get_angle_direction(get_point("left_hip"), get_point("left_knee"), get_point("left_ankle")),
-        "right_knee_angle": get_angle_direction(get_point("right_hip"), get_point("right_knee"), get_point("right_ankle")),
-        "left_hip_angle": get_angle_direction(get_point("left_shoulder"), get_point("left_hip"), get_point("left_knee")),
-        "right_hip_angle": get_angle_direction(get_point("right_shoulder"), get_point("right_hip"), get_point("right_knee")),
-    }
+    angles, directions = {}, {}
+    for name, (i, j, k) in zip(ANGLE_NAMES, _TRIPLET_LANDMARKS):
+        a, b, c = lm[i], lm[j], lm[k]
+        bax, bay = a.x - b.x, a.y - b.y
+        bcx, bcy = c.x - b.x, c.y - b.y
+        if not math.isfinite(bax + bay + bcx + bcy):
+            angles[name] = directions[name] = None
+            continue
+        norm_ba = math.sqrt(bax * bax + bay * bay)
+        norm_bc = math.sqrt(bcx * bcx + bcy * bcy)
+        if norm_ba == 0 or norm_bc == 0:
+            angles[name], directions[name] = None, "undefined"
+            continue
+        cosine = (bax * bcx + bay * bcy) / (norm_ba * norm_bc)
+        angles[name] = math.degrees(math.acos(min(1.0, max(-1.0, cosine))))
+
+        dx, dy = bax / norm_ba + bcx / norm_bc, bay / norm_ba + bcy / norm_bc
+        if dx == 0 and dy == 0:
+            directions[name] = "undefined"
+        elif abs(dx) > abs(dy):
+            directions[name] = "right" if dx > 0 else "left"
+        elif abs(dy) > abs(dx):
+            directions[name] = "down" if dy > 0 else "up"
+        elif dx > 0:
+            directions[name] = "down-right" if dy > 0 else "up-right"
+        else:
+            directions[name] = "down-left" if dy > 0 else "up-left"
+    return angles, directions
+
+def compute_all_angles(results):
+    return compute_all_angles_and_directions(results)[0]
+
+def compute_all_angle_directions(results):
+    return compute_all_angles_and_directions(results)[1]
 
 # === NEW COACH-TONE COMPARE ===
 SIDE_EN = {"left": "left", "right": "right"}
@@ -117,18 +269,19 @@ def angle_action_en(joint_kind, is_open):
         return "Close" if is_open else "Open"
     return "Adjust"
 
+DIRECTION_EN = {
+    "up": "Lift",
+    "down": "Lower",
+    "left": "Shift left",
+    "right": "Shift right",
+    "up-right": "Lift slightly and shift right",
+    "up-left": "Lift slightly and shift left",
+    "down-right": "Lower slightly and shift right",
+    "down-left": "Lower slightly and shift left",
+}
+
 def direction_to_en(d):
-    m = {
-        "up": "Lift",
-        "down": "Lower",
-        "left": "Shift left",
-        "right": "Shift right",
-        "up-right": "Lift slightly and shift right",
-        "up-left": "Lift slightly and shift left",
-        "down-right": "Lower slightly and shift right",
-        "down-left": "Lower slightly and shift left",
-    }
-    return m.get(d, "Hold direction")
+    return DIRECTION_EN.get(d, "Hold direction")
 
 def adverb_for_diff(d):
     if d < 8: return "slightly"
@@ -143,32 +296,146 @@ def parse_joint_meta(name):
     else: kind = "hip"
     return side, kind
 
-def compare_poses(angles_user, angles_ref, dirs_user, dirs_ref, threshold_deg=10.0):
+def _build_joint_templates():
+    # Every string compare_poses needs for a joint, resolved once instead of per frame
+    templates = {}
+    for name in ANGLE_NAMES:
+        side, kind = parse_joint_meta(name)
+        prefix = f"{SIDE_EN[side].capitalize()} {JOINT_LABEL_EN[kind]}: "
+        templates[name] = {
+            "prefix": prefix,
+            "hold_message": prefix + "Nice form—hold it steady. Great work!",
+            "open_action": angle_action_en(kind, True),
+            "closed_action": angle_action_en(kind, False),
+            "direction_cues": {
+                instr: f"{instr.lower()} the {DISTAL_SEGMENT_EN[kind]}" for instr in DIRECTION_EN.values()
+            }
+        }
+    return templates
+
+JOINT_TEMPLATES = _build_joint_templates()
+
+def render_joint_message(name, angle_instr, how_much, dir_instr):
+    template = JOINT_TEMPLATES[name]
+    cues = []
+    if angle_instr != "Hold":
+        cues.append(f"{angle_instr} {how_much}")
+    if dir_instr != "Hold direction":
+        cues.append(f"{'and ' if cues else ''}{template['direction_cues'][dir_instr]}")
+    if not cues:
+        return template["hold_message"]
+    return template["prefix"] + " ".join(cues) + ". You've got this!"
+
+@timed("feedback")
+def compare_poses(angles_user, angles_ref, dirs_user, dirs_ref, threshold_deg=10.0, tolerances=None):
+    # tolerances: optional per-joint thresholds, a dict (None entries use threshold_deg) or a sequence in ANGLE_NAMES order
+    if tolerances is not None and not isinstance(tolerances, dict):
+        tolerances = dict(zip(ANGLE_NAMES, tolerances))
     fixes = {}
     for name in ANGLE_NAMES:
         au, ar = angles_user.get(name), angles_ref.get(name)
         du, dr = dirs_user.get(name), dirs_ref.get(name)
         if au is None or ar is None:
             continue
-        side, kind = parse_joint_meta(name)
-        side_en, joint_en, distal_en = SIDE_EN[side], JOINT_LABEL_EN[kind], DISTAL_SEGMENT_EN[kind]
-        diff, abs_diff, is_open = au - ar, abs(au - ar), (au - ar) > 0
-        angle_instr = angle_action_en(kind, is_open) if abs_diff > threshold_deg else "Hold"
-        dir_instr = direction_to_en(dr) if du != dr and dr is not None else "Hold direction"
-        how_much = adverb_for_diff(abs_diff)
-        cues = []
-        if angle_instr != "Hold":
-            cues.append(f"{angle_instr} {how_much}")
-        if dir_instr != "Hold direction":
-            cues.append(f"{'and ' if cues else ''}{dir_instr.lower()} the {distal_en}")
-        if not cues:
-            message = f"{side_en.capitalize()} {joint_en}: Nice form—hold it steady. Great work!"
+        template = JOINT_TEMPLATES[name]
+        diff = au - ar
+        abs_diff = abs(diff)
+        limit = tolerances.get(name) if tolerances else None
+        if abs_diff > (threshold_deg if limit is None else limit):
+            angle_instr = template["open_action"] if diff > 0 else template["closed_action"]
         else:
-            message = f"{side_en.capitalize()} {joint_en}: " + " ".join(cues) + ". You've got this!"
+            angle_instr = "Hold"
+        dir_instr = direction_to_en(dr) if du != dr and dr is not None else "Hold direction"
         fixes[name] = {
             "angle_diff_deg": int(round(abs_diff)),
             "angle_action": angle_instr,
             "direction_action": dir_instr,
-            "message_en": message
+            "message_en": render_joint_message(name, angle_instr, adverb_for_diff(abs_diff), dir_instr)
         }
     return fixes
+
+# === BATCH COMPARE (many students, one reference) ===
+ANGLE_ACTIONS = ("Hold", "Bend", "Straighten", "Close", "Open", "Adjust")
+DIRECTION_ACTIONS = ("Hold direction",) + tuple(DIRECTION_EN.values())
+
+_OPEN_ACTION_CODES = np.array([ANGLE_ACTIONS.index(JOINT_TEMPLATES[n]["open_action"]) for n in ANGLE_NAMES], dtype=np.int8)
+_CLOSED_ACTION_CODES = np.array([ANGLE_ACTIONS.index(JOINT_TEMPLATES[n]["closed_action"]) for n in ANGLE_NAMES], dtype=np.int8)
+# Reference direction code (last slot = DIRECTION_MISSING) -> index into DIRECTION_ACTIONS
+_DIRECTION_ACTION_CODES = np.array(
+    [DIRECTION_ACTIONS.index(direction_to_en(d)) for d in DIRECTION_NAMES] + [0], dtype=np.int8
+)
+
+BATCH_FIX_DTYPE = np.dtype([
+    ("valid", np.bool_),
+    ("angle_diff_deg", np.float64),
+    ("angle_action", np.int8),
+    ("direction_action", np.int8)
+])
+
+@timed("feedback")
+def compare_poses_batch(angles_user, dirs_user, angles_ref, dirs_ref, threshold_deg=10.0):
+    """
+    compare_poses for S students against one reference, without rendering any text.
+    - angles_user: (S, 8) array in ANGLE_NAMES order, NaN = missing
+    - dirs_user: (S, 8) direction codes (DIRECTION_MISSING = missing)
+    - angles_ref / dirs_ref: reference dicts, or (8,) angle array and direction codes
+    - threshold_deg: scalar, or (8,) per-joint tolerances (see ReferenceIndex.tolerances)
+
+    Returns: (S, 8) structured array of BATCH_FIX_DTYPE; angle_action and direction_action index
+    ANGLE_ACTIONS and DIRECTION_ACTIONS. Use batch_fix / batch_fixes to render messages.
+    """
+    if isinstance(angles_ref, dict):
+        angles_ref = angles_from_dict(angles_ref)
+    if isinstance(dirs_ref, dict):
+        dirs_ref = directions_from_dict(dirs_ref)
+    angles_user = np.atleast_2d(np.asarray(angles_user, dtype=np.float64))
+    dirs_user = np.atleast_2d(np.asarray(dirs_user, dtype=np.int8))
+    dirs_ref = np.asarray(dirs_ref, dtype=np.int8)
+
+    diff = angles_user - angles_ref
+    abs_diff = np.abs(diff)
+    result = np.empty(angles_user.shape, dtype=BATCH_FIX_DTYPE)
+    result["valid"] = ~np.isnan(diff)
+    result["angle_diff_deg"] = abs_diff
+    result["angle_action"] = np.where(
+        abs_diff > threshold_deg,
+        np.where(diff > 0, _OPEN_ACTION_CODES, _CLOSED_ACTION_CODES),
+        0
+    )
+    result["direction_action"] = np.where(
+        (dirs_user != dirs_ref) & (dirs_ref != DIRECTION_MISSING),
+        _DIRECTION_ACTION_CODES[dirs_ref],
+        0
+    )
+    return result
+
+def batch_fix(result, student, joint):
+    """
+    Render one entry of compare_poses_batch output as a compare_poses fix dict (None if not comparable).
+    - joint: index or name from ANGLE_NAMES
+    """
+    j = joint if isinstance(joint, (int, np.integer)) else ANGLE_NAMES.index(joint)
+    entry = result[student, j]
+    if not entry["valid"]:
+        return None
+    abs_diff = float(entry["angle_diff_deg"])
+    angle_instr = ANGLE_ACTIONS[entry["angle_action"]]
+    dir_instr = DIRECTION_ACTIONS[entry["direction_action"]]
+    return {
+        "angle_diff_deg": int(round(abs_diff)),
+        "angle_action": angle_instr,
+        "direction_action": dir_instr,
+        "message_en": render_joint_message(ANGLE_NAMES[j], angle_instr, adverb_for_diff(abs_diff), dir_instr)
+    }
+
+def batch_fixes(result, student, joints=None):
+    """
+    compare_poses-style dict for one student, rendering only the requested joints.
+    """
+    joints = range(len(ANGLE_NAMES)) if joints is None else joints
+    fixes = {}
+    for joint in joints:
+        fix = batch_fix(result, student, joint)
+        if fix is not None:
+            fixes[ANGLE_NAMES[joint] if isinstance(joint, (int, np.integer)) else joint] = fix
+    return fixes
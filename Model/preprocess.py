@@ -0,0 +1,137 @@
+import struct
+
+import cv2
+import numpy as np
+
+# cv2.imdecode flags for JPEG DCT-domain downscaled decoding, largest factor first
+_REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def jpeg_image_size(data):
+    """
+    Read (width, height) from a JPEG header without decoding the pixels.
+    Returns None for other formats or truncated data.
+    """
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                i += 2
+                continue
+            length = struct.unpack(">H", data[i + 2:i + 4])[0]
+            # SOF0..SOF15, excluding DHT (C4), JPG (C8) and DAC (CC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[i + 5:i + 9])
+                return width, height
+            i += 2 + length
+    return None
+
+
+class FramePreprocessor:
+    """
+    Shrinks frames before Mediapipe inference and maps the landmarks back to full-frame coordinates.
+
+    - The frame (or a region of interest around a previously found pose) is resized so its long
+      side is at most target_size, and only that small image is color-converted.
+    - Landmarks are normalized to the processed region, so they are mapped back with the crop
+      transform; angles computed from the mapped keypoints match the full-frame ones.
+    """
+    def __init__(self, target_size=640, roi_padding=0.3, min_roi_visibility=0.5, min_roi_fraction=0.2):
+        """
+        - target_size: long side, in pixels, of the image handed to Mediapipe (None = no resizing)
+        - roi_padding: margin added around the previous pose, as a fraction of its bounding box size
+        - min_roi_visibility: landmarks below this visibility are ignored when building the ROI
+        - min_roi_fraction: ROIs smaller than this fraction of the frame side are enlarged
+        """
+        self.target_size = target_size
+        self.roi_padding = roi_padding
+        self.min_roi_visibility = min_roi_visibility
+        self.min_roi_fraction = min_roi_fraction
+
+    def decode(self, data):
+        """
+        Decode an encoded image, letting libjpeg downscale by 2/4/8 while the result
+        still has a long side of at least target_size.
+        """
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        size = jpeg_image_size(data) if self.target_size else None
+        if size is not None:
+            long_side = max(size)
+            for factor, flag in _REDUCED_DECODE_FLAGS:
+                if long_side // factor >= self.target_size:
+                    return cv2.imdecode(buffer, flag)
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    def roi_from_keypoints(self, keypoints, width, height):
+        """
+        Padded pixel box (x0, y0, x1, y1) around the visible landmarks, or None to use the full frame.
+        """
+        if keypoints is None:
+            return None
+        visible = keypoints[keypoints[:, 3] >= self.min_roi_visibility]
+        if len(visible) < 4:
+            return None
+        xs = np.clip(visible[:, 0], 0.0, 1.0) * width
+        ys = np.clip(visible[:, 1], 0.0, 1.0) * height
+        box_w, box_h = xs.max() - xs.min(), ys.max() - ys.min()
+        pad = self.roi_padding * max(box_w, box_h)
+        min_side = self.min_roi_fraction * max(width, height)
+        cx, cy = (xs.max() + xs.min()) / 2, (ys.max() + ys.min()) / 2
+        half_w, half_h = max(box_w + 2 * pad, min_side) / 2, max(box_h + 2 * pad, min_side) / 2
+        x0, x1 = int(max(0, cx - half_w)), int(min(width, np.ceil(cx + half_w)))
+        y0, y1 = int(max(0, cy - half_h)), int(min(height, np.ceil(cy + half_h)))
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return x0, y0, x1, y1
+
+    def contains_pose(self, roi, keypoints, width, height):
+        """
+        True if every visible landmark of keypoints lies inside the pixel box roi.
+        """
+        x0, y0, x1, y1 = roi
+        visible = keypoints[keypoints[:, 3] >= self.min_roi_visibility]
+        if not len(visible):
+            return True
+        xs, ys = visible[:, 0] * width, visible[:, 1] * height
+        return bool(xs.min() >= x0 and xs.max() <= x1 and ys.min() >= y0 and ys.max() <= y1)
+
+    def prepare(self, image, roi=None):
+        """
+        Crop (to the pixel box roi, see roi_from_keypoints), downscale and convert a BGR frame.
+        Returns:
+            image_rgb: the small RGB image to feed to Mediapipe
+            transform: (x0, y0, crop_width, crop_height, frame_width, frame_height) for to_original
+        """
+        height, width = image.shape[:2]
+        x0, y0, x1, y1 = roi if roi is not None else (0, 0, width, height)
+        crop = image[y0:y1, x0:x1]
+
+        crop_h, crop_w = crop.shape[:2]
+        if self.target_size and max(crop_w, crop_h) > self.target_size:
+            scale = self.target_size / max(crop_w, crop_h)
+            size = (max(1, round(crop_w * scale)), max(1, round(crop_h * scale)))
+            crop = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+        image_rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        return image_rgb, (x0, y0, crop_w, crop_h, width, height)
+
+    @staticmethod
+    def is_identity(transform):
+        x0, y0, crop_w, crop_h, width, height = transform
+        return x0 == 0 and y0 == 0 and crop_w == width and crop_h == height
+
+    @staticmethod
+    def to_original(keypoints, transform):
+        """
+        Map (33, 4) keypoints normalized to the processed region back to the full frame.
+        z is scaled like x, matching Mediapipe's convention that z uses the image width scale.
+        """
+        x0, y0, crop_w, crop_h, width, height = transform
+        mapped = np.array(keypoints, dtype=np.float64, copy=True)
+        mapped[:, 0] = (mapped[:, 0] * crop_w + x0) / width
+        mapped[:, 1] = (mapped[:, 1] * crop_h + y0) / height
+        mapped[:, 2] = mapped[:, 2] * crop_w / width
+        return mapped
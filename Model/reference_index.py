@@ -0,0 +1,180 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from pose_utils import (
+    ANGLE_NAMES,
+    DIRECTION_MISSING,
+    angles_from_dict,
+    angles_to_dict,
+    directions_from_dict,
+    directions_to_dict
+)
+
+REFERENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "json_reference")
+REFERENCE_SUFFIX = "_reference.json"
+
+
+class ReferenceIndex:
+    """
+    All reference poses loaded once into contiguous matrices:
+        angles: (P, 8) float64 in ANGLE_NAMES order, NaN where the reference has no value
+        directions: (P, 8) int8 direction codes (see pose_utils.DIRECTION_NAMES)
+    so a user pose can be scored against every reference in one vectorized operation.
+    """
+    def __init__(self, reference_dir=REFERENCE_DIR, direction_weight=15.0, reload_interval=1.0):
+        """
+        - direction_weight: degrees added to the distance for a joint whose direction differs
+        - reload_interval: seconds between checks for changed reference files (None disables hot reload)
+        """
+        self.reference_dir = reference_dir
+        self.direction_weight = direction_weight
+        self.reload_interval = reload_interval
+        self._last_check = time.monotonic()
+        self.reload()
+
+    def reload(self):
+        """
+        (Re)load every <pose>_reference.json file in reference_dir; poses are named by file.
+        A file that cannot be read or parsed (e.g. caught mid-write) keeps its last loaded values
+        and is retried on the next check.
+        """
+        mtimes = self._scan()
+        previous = getattr(self, "_positions", {})
+        names, angles, directions, stds = [], [], [], []
+        for filename in sorted(mtimes):
+            name = filename[:-len(REFERENCE_SUFFIX)]
+            try:
+                with open(os.path.join(self.reference_dir, filename), "r") as f:
+                    data = json.load(f)
+                row = (
+                    angles_from_dict(data.get("angles", {})),
+                    directions_from_dict(data.get("directions", {})),
+                    angles_from_dict(data.get("stats", {}).get("std", {}))
+                )
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                mtimes[filename] = None  # never equal to a scanned mtime, so it is retried
+                if name not in previous:
+                    print(f"Skipping reference {filename}: {e}")
+                    continue
+                i = previous[name]
+                row = (self.angles[i], self.directions[i], self.stds[i])
+            names.append(name)
+            angles.append(row[0])
+            directions.append(row[1])
+            stds.append(row[2])
+
+        self.pose_names = names
+        self.angles = np.array(angles, dtype=np.float64).reshape(len(names), len(ANGLE_NAMES))
+        self.directions = np.array(directions, dtype=np.int8).reshape(len(names), len(ANGLE_NAMES))
+        self.stds = np.array(stds, dtype=np.float64).reshape(len(names), len(ANGLE_NAMES))
+        self._positions = {name: i for i, name in enumerate(names)}
+        self._mtimes = mtimes
+
+    def reload_if_changed(self):
+        """
+        Reload when a reference file was added, removed or modified. Returns True if reloaded.
+        """
+        self._last_check = time.monotonic()
+        if self._scan() == self._mtimes:
+            return False
+        self.reload()
+        return True
+
+    def _maybe_reload(self):
+        if self.reload_interval is not None and time.monotonic() - self._last_check >= self.reload_interval:
+            self.reload_if_changed()
+
+    def _scan(self):
+        mtimes = {}
+        with os.scandir(self.reference_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(REFERENCE_SUFFIX):
+                    mtimes[entry.name] = entry.stat().st_mtime_ns
+        return mtimes
+
+    def __len__(self):
+        return len(self.pose_names)
+
+    def __contains__(self, pose_name):
+        return pose_name in self._positions
+
+    def reference(self, pose_name):
+        """
+        Returns (angles, directions) dicts for one reference, as expected by compare_poses.
+        """
+        self._maybe_reload()
+        i = self._positions[pose_name]
+        return angles_to_dict(self.angles[i]), directions_to_dict(self.directions[i])
+
+    def tolerances(self, pose_name, k=2.0, min_deg=5.0, max_deg=25.0, default_deg=10.0):
+        """
+        Per-joint angle tolerances for one reference: k standard deviations of the reference images,
+        clipped to [min_deg, max_deg]; default_deg where the reference has no statistics.
+        Returns: (8,) array, usable as compare_poses(tolerances=...) or compare_poses_batch(threshold_deg=...)
+        """
+        self._maybe_reload()
+        std = self.stds[self._positions[pose_name]]
+        return np.where(np.isnan(std), default_deg, np.clip(k * std, min_deg, max_deg))
+
+    def distances(self, angles, directions=None):
+        """
+        Distance from user poses to every reference.
+        - angles: (8,) or (B, 8) array (NaN = missing), or an angles dict
+        - directions: matching direction codes or a directions dict; None ignores directions
+
+        Returns: (P,) or (B, P) array of mean per-joint distances in degrees
+        (NaN if no joint can be compared)
+        """
+        self._maybe_reload()
+        if isinstance(angles, dict):
+            angles = angles_from_dict(angles)
+        if isinstance(directions, dict):
+            directions = directions_from_dict(directions)
+        user_angles = np.asarray(angles, dtype=np.float64)
+        single = user_angles.ndim == 1
+        user_angles = np.atleast_2d(user_angles)
+
+        joint_cost = np.abs(user_angles[:, np.newaxis, :] - self.angles[np.newaxis, :, :])  # (B, P, 8)
+        if directions is not None:
+            user_dirs = np.atleast_2d(np.asarray(directions, dtype=np.int8))[:, np.newaxis, :]
+            ref_dirs = self.directions[np.newaxis, :, :]
+            mismatch = (user_dirs != ref_dirs) & (user_dirs != DIRECTION_MISSING) & (ref_dirs != DIRECTION_MISSING)
+            joint_cost = joint_cost + self.direction_weight * mismatch
+
+        valid = ~np.isnan(joint_cost)
+        counts = valid.sum(axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = np.where(valid, joint_cost, 0.0).sum(axis=-1) / counts
+        return result[0] if single else result
+
+    def rank(self, angles, directions=None, top_k=None):
+        """
+        Rank the references for one user pose.
+        Returns: list of (pose_name, distance) sorted from closest to farthest
+        """
+        dist = self.distances(angles, directions)
+        if dist.ndim != 1:
+            raise ValueError("rank() takes a single pose; use rank_batch() for several")
+        order = np.argsort(dist, kind="stable")[:top_k]
+        return [(self.pose_names[i], float(dist[i])) for i in order]
+
+    def rank_batch(self, angles, directions=None):
+        """
+        Rank the references for a batch of user poses.
+        Returns:
+            order: (B, P) reference indices (into pose_names), closest first
+            distances: (B, P) distances sorted the same way
+        """
+        dist = np.atleast_2d(self.distances(angles, directions))
+        order = np.argsort(dist, axis=1, kind="stable")
+        return order, np.take_along_axis(dist, order, axis=1)
+
+    def classify(self, angles, directions=None):
+        """
+        Returns: (pose_name, distance) of the closest reference, or (None, nan) if the index is empty.
+        """
+        ranked = self.rank(angles, directions, top_k=1)
+        return ranked[0] if ranked else (None, float("nan"))
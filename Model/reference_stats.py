@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from pose_utils import (
+    ANGLE_NAMES,
+    DIRECTION_CODES,
+    DIRECTION_MISSING,
+    DIRECTION_NAMES,
+    compute_angles_and_directions_batch
+)
+
+
+class ReferenceStats:
+    """
+    Running sufficient statistics of one reference pose, per joint:
+        count, mean and M2 of the angle (Welford), and a histogram of direction codes.
+
+    Joint angles come from arccos and lie in [0, 180], so they never wrap around and the
+    linear mean/variance is the right estimator. Samples can be folded in one at a time
+    (add), per batch (add_batch), or whole partial references combined (merge).
+    """
+    def __init__(self):
+        n = len(ANGLE_NAMES)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.mean = np.zeros(n, dtype=np.float64)
+        self.m2 = np.zeros(n, dtype=np.float64)
+        self.direction_counts = np.zeros((n, len(DIRECTION_NAMES)), dtype=np.int64)
+
+    def add(self, angles, directions):
+        """
+        Fold in one frame: (8,) angles (NaN = missing) and (8,) direction codes. O(1).
+        """
+        angles = np.asarray(angles, dtype=np.float64)
+        valid = ~np.isnan(angles)
+        self.count += valid
+        delta = np.where(valid, angles - self.mean, 0.0)
+        self.mean += np.where(valid, delta / np.maximum(self.count, 1), 0.0)
+        self.m2 += np.where(valid, delta * (np.nan_to_num(angles) - self.mean), 0.0)
+        self._count_directions(np.asarray(directions, dtype=np.int8)[np.newaxis])
+
+    def add_batch(self, angles, directions):
+        """
+        Fold in (N, 8) angles and direction codes at once.
+        """
+        angles = np.atleast_2d(np.asarray(angles, dtype=np.float64))
+        valid = ~np.isnan(angles)
+        batch = ReferenceStats()
+        batch.count = valid.sum(axis=0)
+        sums = np.where(valid, angles, 0.0).sum(axis=0)
+        batch.mean = np.divide(sums, batch.count, out=np.zeros_like(sums), where=batch.count > 0)
+        batch.m2 = (np.where(valid, angles - batch.mean, 0.0) ** 2).sum(axis=0)
+        batch._count_directions(np.atleast_2d(np.asarray(directions, dtype=np.int8)))
+        self.merge(batch)
+
+    def merge(self, other):
+        """
+        Combine another partial reference into this one (Chan et al. parallel update).
+        """
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        safe_total = np.maximum(total, 1)
+        self.mean = self.mean + delta * other.count / safe_total
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / safe_total
+        self.count = total
+        self.direction_counts = self.direction_counts + other.direction_counts
+        return self
+
+    def _count_directions(self, codes):
+        for j in range(codes.shape[1]):
+            column = codes[:, j]
+            column = column[column != DIRECTION_MISSING]
+            self.direction_counts[j] += np.bincount(column, minlength=len(DIRECTION_NAMES))
+
+    @property
+    def variance(self):
+        """
+        Sample variance per joint (NaN with fewer than 2 samples).
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def directions(self):
+        """
+        Most common direction code per joint (DIRECTION_MISSING if never observed).
+        """
+        return np.where(self.direction_counts.sum(axis=1) > 0, self.direction_counts.argmax(axis=1), DIRECTION_MISSING)
+
+    def tolerances(self, k=2.0, min_deg=5.0, max_deg=25.0):
+        """
+        Data-driven per-joint tolerances for compare_poses: k standard deviations, clipped
+        to [min_deg, max_deg]. Joints with fewer than 2 samples map to None (use the default threshold).
+        """
+        std = self.std
+        return {
+            name: None if np.isnan(s) else float(np.clip(k * s, min_deg, max_deg))
+            for name, s in zip(ANGLE_NAMES, std)
+        }
+
+    def to_reference(self, pose_name):
+        """
+        Reference dict in the json_reference format, with the running statistics under "stats".
+        """
+        std = self.std
+        modes = self.directions()
+        return {
+            "pose_name": pose_name,
+            "angles": {
+                name: round(float(m), 3) if c else None
+                for name, m, c in zip(ANGLE_NAMES, self.mean, self.count)
+            },
+            "directions": {
+                name: None if d == DIRECTION_MISSING else DIRECTION_NAMES[d]
+                for name, d in zip(ANGLE_NAMES, modes)
+            },
+            "stats": {
+                "count": {name: int(c) for name, c in zip(ANGLE_NAMES, self.count)},
+                "mean": {name: float(m) for name, m in zip(ANGLE_NAMES, self.mean)},
+                "m2": {name: float(m) for name, m in zip(ANGLE_NAMES, self.m2)},
+                "std": {name: None if np.isnan(s) else round(float(s), 3) for name, s in zip(ANGLE_NAMES, std)},
+                "direction_counts": {
+                    name: {d: int(c) for d, c in zip(DIRECTION_NAMES, counts) if c}
+                    for name, counts in zip(ANGLE_NAMES, self.direction_counts)
+                }
+            }
+        }
+
+    @classmethod
+    def from_reference(cls, data):
+        """
+        Rebuild the statistics stored in a reference dict written by to_reference.
+        """
+        if "stats" not in data:
+            raise ValueError(
+                f"Reference {data.get('pose_name')} has no running statistics; rebuild it with build_references.py"
+            )
+        stats = data["stats"]
+        result = cls()
+        for j, name in enumerate(ANGLE_NAMES):
+            result.count[j] = stats["count"].get(name, 0)
+            result.mean[j] = stats["mean"].get(name, 0.0)
+            result.m2[j] = stats["m2"].get(name, 0.0)
+            for direction, c in stats["direction_counts"].get(name, {}).items():
+                result.direction_counts[j, DIRECTION_CODES[direction]] = c
+        return result
+
+
+def load_reference_stats(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    return data.get("pose_name"), ReferenceStats.from_reference(data)
+
+
+def write_reference(path, data):
+    """
+    Atomically write a reference dict, so a ReferenceIndex hot reload never sees a partial file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def save_reference(path, pose_name, stats):
+    write_reference(path, stats.to_reference(pose_name))
+
+
+def add_images(reference_path, image_paths, detector=None):
+    """
+    Fold new images into an existing reference file without re-running the old ones.
+    Returns: number of images in which a pose was detected
+    """
+    pose_name, stats = load_reference_stats(reference_path)
+    if detector is None:
+        from pose_detector import PoseDetector
+        detector = PoseDetector(render_every=0)
+
+    keypoints = []
+    for path in image_paths:
+        detector.images_dir = os.path.dirname(os.path.abspath(path))
+        _, kp, _ = detector.detect_pose(os.path.basename(path), save_landmarks=False)
+        if kp is None:
+            print(f"[{pose_name}] {path}: Pose not detected")
+            continue
+        keypoints.append(kp)
+
+    if keypoints:
+        stats.add_batch(*compute_angles_and_directions_batch(np.stack(keypoints)))
+        save_reference(reference_path, pose_name, stats)
+    print(f"[{pose_name}] added {len(keypoints)}/{len(image_paths)} images to {reference_path}")
+    return len(keypoints)
+
+
+def merge_references(output_path, reference_paths):
+    """
+    Merge partial references (e.g. built on different machines) into one file.
+    """
+    pose_name, merged = None, ReferenceStats()
+    for path in reference_paths:
+        name, stats = load_reference_stats(path)
+        pose_name = pose_name or name
+        merged.merge(stats)
+    save_reference(output_path, pose_name, merged)
+    print(f"[{pose_name}] merged {len(reference_paths)} references into {output_path}")
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update reference poses incrementally.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Fold new images into an existing reference file")
+    add.add_argument("reference", help="Path to <pose>_reference.json")
+    add.add_argument("images", nargs="+", help="Image files to add")
+    merge = commands.add_parser("merge", help="Merge partial references of the same pose")
+    merge.add_argument("output", help="Output reference file")
+    merge.add_argument("references", nargs="+", help="Reference files to merge")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        add_images(args.reference, args.images)
+    else:
+        merge_references(args.output, args.references)
+
+
+if __name__ == "__main__":
+    main()
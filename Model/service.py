@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from metrics import enable_metrics, get_metrics
+from pose_utils import (
+    angles_to_dict,
+    compare_poses,
+    compute_angles_and_directions_batch,
+    directions_to_dict
+)
+from reference_index import REFERENCE_DIR, ReferenceIndex
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+# One warm detector per worker process, created by _init_worker
+_detector = None
+
+
+def _init_worker(detector_kwargs):
+    global _detector
+    from pose_detector import PoseDetector
+    enable_metrics()
+    _detector = PoseDetector(render_every=0, **detector_kwargs)
+
+
+def _detect_batch(frames):
+    """
+    Worker task: detect every encoded frame of a micro-batch.
+    Returns:
+        list of (keypoints or None, confidence, error message or None)
+        the worker's metrics recorded for this batch (PipelineMetrics.drain), merged by the service
+    """
+    out = []
+    for data in frames:
+        try:
+            _, keypoints, confidence = _detector.detect_bytes(data)
+        except Exception as e:
+            out.append((None, 0.0, str(e)))
+            continue
+        out.append((keypoints, float(confidence), None))
+    return out, get_metrics().drain()
+
+
+class Overloaded(Exception):
+    pass
+
+
+class _Request:
+    __slots__ = ("data", "pose", "future")
+
+    def __init__(self, data, pose, future):
+        self.data = data
+        self.pose = pose
+        self.future = future
+
+
+class PoseService:
+    """
+    Local asyncio HTTP service running frames through a pool of warm PoseDetector processes.
+
+    Endpoints:
+        POST /detect[?pose=<name>]  body = encoded image; returns keypoints, angles, directions,
+                                    the closest reference poses and, with pose, compare_poses feedback
+        GET /health                 queue and batch statistics
+        GET /metrics                Prometheus text exposition of the pipeline metrics, aggregated
+                                    over the worker processes (detection) and the service (coaching)
+
+    Requests are grouped into micro-batches of up to max_batch frames (waiting at most
+    max_wait_ms for a batch to fill); at most one batch per worker is in flight and at most
+    max_pending frames may wait, beyond which requests are rejected with 503.
+    """
+    def __init__(self, host="127.0.0.1", port=8765, workers=2, max_batch=8, max_wait_ms=5.0,
+                 max_pending=64, reference_dir=REFERENCE_DIR, detector_kwargs=None):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.references = ReferenceIndex(reference_dir)
+        self.metrics = get_metrics()
+        self.detector_kwargs = detector_kwargs or {}
+        self.pending = 0
+        self.batches = 0
+        self.frames = 0
+        self.rejected = 0
+        self._pool = None
+        self._server = None
+        self._queue = None
+        self._slots = None
+        self._batcher = None
+        self._connections = set()
+
+    async def start(self):
+        enable_metrics()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(self.detector_kwargs,))
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        # Fork the workers before listening: a worker forked later inherits the open client
+        # sockets and keeps them alive after the handler closes them
+        await asyncio.get_running_loop().run_in_executor(self._pool, os.getpid)
+        self._batcher = asyncio.create_task(self._run_batcher())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # resolves port=0
+        print(f"Pose service listening on http://{self.host}:{self.port} with {self.workers} workers")
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def analyze(self, data, pose=None):
+        """
+        Run one encoded frame through detection and coaching. Raises Overloaded when the queue is full.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded()
+        if pose is not None and pose not in self.references:
+            raise KeyError(pose)
+        future = asyncio.get_running_loop().create_future()
+        self.pending += 1
+        self._queue.put_nowait(_Request(data, pose, future))
+        try:
+            return await future
+        finally:
+            self.pending -= 1
+
+    async def _run_batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Back-pressure: wait for a free worker before dispatching the next batch
+            await self._slots.acquire()
+            task = loop.run_in_executor(self._pool, _detect_batch, [r.data for r in batch])
+            task.add_done_callback(lambda t, b=batch: self._finish_batch(t, b))
+
+    def _finish_batch(self, task, batch):
+        """
+        Resolve every request of a finished batch; no failure may leave a client waiting.
+        """
+        self._slots.release()
+        self.batches += 1
+        self.frames += len(batch)
+        if task.cancelled():
+            for request in batch:
+                if not request.future.done():
+                    request.future.cancel()
+            return
+        try:
+            detections, worker_metrics = task.result()
+            self.metrics.merge(worker_metrics)
+            self._resolve(batch, detections)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    def _resolve(self, batch, detections):
+        detected = [i for i, (kp, _, _) in enumerate(detections) if kp is not None]
+        if detected:
+            angles, directions = compute_angles_and_directions_batch(np.stack([detections[i][0] for i in detected]))
+        rows = {i: row for row, i in enumerate(detected)}
+
+        for i, (request, (keypoints, confidence, error)) in enumerate(zip(batch, detections)):
+            if request.future.done():
+                continue
+            try:
+                if error is not None:
+                    raise ValueError(error)
+                if keypoints is None:
+                    response = {"detected": False, "confidence": 0.0}
+                else:
+                    response = self._response(request, keypoints, confidence, angles[rows[i]], directions[rows[i]])
+            except Exception as e:
+                request.future.set_exception(e)
+            else:
+                request.future.set_result(response)
+
+    def _response(self, request, keypoints, confidence, angles, directions):
+        angles_user, dirs_user = angles_to_dict(angles), directions_to_dict(directions)
+        response = {
+            "detected": True,
+            "confidence": confidence,
+            "keypoints": keypoints.tolist(),
+            "angles": angles_user,
+            "directions": dirs_user,
+            # NaN (no comparable joint) is not valid JSON
+            "closest_poses": [
+                (name, None if np.isnan(distance) else distance)
+                for name, distance in self.references.rank(angles, directions, top_k=3)
+            ]
+        }
+        if request.pose is not None:
+            angles_ref, dirs_ref = self.references.reference(request.pose)
+            response["pose"] = request.pose
+            response["feedback"] = compare_poses(angles_user, angles_ref, dirs_user, dirs_ref)
+        return response
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "batches": self.batches,
+            "frames": self.frames,
+            "rejected": self.rejected,
+            "mean_batch_size": self.frames / self.batches if self.batches else 0.0,
+            "poses": self.references.pose_names
+        }
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self._route(method, target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            pass  # service shutting down
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _route(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, self.stats()
+        if url.path == "/metrics":
+            return 200, self.metrics.to_prometheus()
+        if url.path != "/detect":
+            return 404, {"error": f"unknown path {url.path}"}
+        if method != "POST":
+            return 405, {"error": "use POST with an encoded image body"}
+        if not body:
+            return 400, {"error": "empty request body"}
+
+        pose = parse_qs(url.query).get("pose", [None])[0]
+        start = time.perf_counter()
+        try:
+            result = await self.analyze(body, pose)
+        except Overloaded:
+            return 503, {"error": "service overloaded, retry later"}
+        except KeyError:
+            return 400, {"error": f"unknown pose {pose}"}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"detection failed: {e}"}
+        result["latency_ms"] = (time.perf_counter() - start) * 1000.0
+        return 200, result
+
+    async def _respond(self, writer, status, payload, keep_alive=True):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        headers = [
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+def detect(host, port, image_bytes, pose=None, timeout=30.0):
+    """
+    Minimal blocking client: POST an encoded image to a running service.
+    Returns: (status code, decoded JSON response)
+    """
+    path = "/detect" if pose is None else f"/detect?pose={pose}"
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        connection.request("POST", path, body=image_bytes, headers={"Content-Type": "application/octet-stream"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local pose inference service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2, help="Detector worker processes")
+    parser.add_argument("--max-batch", type=int, default=8, help="Largest micro-batch sent to one worker")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="How long to wait for a micro-batch to fill")
+    parser.add_argument("--max-pending", type=int, default=64, help="Frames allowed to wait before returning 503")
+    parser.add_argument("--model-complexity", type=int, default=1)
+    args = parser.parse_args()
+
+    service = PoseService(args.host, args.port, args.workers, args.max_batch, args.max_wait_ms, args.max_pending,
+                          detector_kwargs={"model_complexity": args.model_complexity})
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
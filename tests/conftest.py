@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# The Model modules import each other by flat name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Model"))
+
+
+class FakePose:
+    """
+    Stand-in for mediapipe.solutions.pose.Pose: a fixed skeleton after a fixed delay.
+    Calls listed in `misses` find no pose; input shapes, graph resets and closes are recorded.
+    """
+    misses = ()
+
+    def __init__(self, delay=0.01, **kwargs):
+        self.delay = delay
+        self.calls = 0
+        self.resets = 0
+        self.shapes = []
+        self.closed = False
+
+    def reset(self):
+        self.resets += 1
+
+    def close(self):
+        self.closed = True
+
+    def process(self, image_rgb):
+        self.calls += 1
+        self.shapes.append(image_rgb.shape)
+        time.sleep(self.delay)
+        if self.calls in self.misses:
+            return SimpleNamespace(pose_landmarks=None)
+        landmarks = [SimpleNamespace(x=0.5 + 0.01 * i, y=i / 33, z=0.0, visibility=0.9) for i in range(33)]
+        return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=landmarks))
+
+
+class FakeLandmarkList:
+    def __init__(self):
+        self.landmark = SimpleNamespace(items=[], add=self._add)
+
+    def _add(self, **fields):
+        self.landmark.items.append(SimpleNamespace(**fields))
+
+
+@pytest.fixture
+def fake_backends(monkeypatch):
+    """
+    Real cv2 with a fake Mediapipe, installed into pose_detector; returns the fake solutions.
+    """
+    cv2 = pytest.importorskip("cv2")
+    import pose_detector
+    solutions = SimpleNamespace(
+        pose=SimpleNamespace(Pose=FakePose, POSE_CONNECTIONS=()),
+        drawing_utils=SimpleNamespace(draw_landmarks=lambda image, landmarks, connections: None)
+    )
+    monkeypatch.setattr(pose_detector, "cv2", cv2)
+    monkeypatch.setattr(pose_detector, "mp", SimpleNamespace(solutions=solutions))
+    monkeypatch.setattr(pose_detector, "landmark_pb2", SimpleNamespace(NormalizedLandmarkList=FakeLandmarkList))
+    return solutions
+
+
+@pytest.fixture
+def detector(fake_backends, tmp_path):
+    import pose_detector
+    detector = pose_detector.PoseDetector(render_every=0)
+    detector.landmarks_dir = str(tmp_path)
+    yield detector
+    detector.close()
@@ -0,0 +1,30 @@
+import numpy as np
+
+from coach import CoachSession
+from pose_utils import ANGLE_NAMES, DIRECTION_CODES
+
+REF_ANGLES = np.full(len(ANGLE_NAMES), 90.0)
+REF_DIRS = np.full(len(ANGLE_NAMES), DIRECTION_CODES["up"], dtype=np.int8)
+
+
+def test_lost_joint_is_removed_and_breaks_the_hold():
+    session = CoachSession(REF_ANGLES, REF_DIRS, smoothing=1.0)
+    angles = REF_ANGLES.copy()
+    angles[0] = 130.0
+    updates = session.update(angles, REF_DIRS, timestamp=0.0)
+    assert updates[ANGLE_NAMES[0]]["angle_action"] != "Hold"
+    assert not session.holding
+
+    lost = REF_ANGLES.copy()
+    lost[0] = np.nan
+    updates = session.update(lost, REF_DIRS, timestamp=1.0)
+    assert updates == {ANGLE_NAMES[0]: None}
+    assert ANGLE_NAMES[0] not in session.fixes
+    assert not session.holding and session.hold_time == 0.0
+    assert session.update(lost, REF_DIRS, timestamp=2.0) == {}
+
+    # The joint comes back in tolerance: a fresh cue is emitted and the hold starts
+    updates = session.update(REF_ANGLES, REF_DIRS, timestamp=3.0)
+    assert updates[ANGLE_NAMES[0]]["angle_action"] == "Hold"
+    session.update(REF_ANGLES, REF_DIRS, timestamp=5.0)
+    assert session.holding and session.hold_time == 2.0
@@ -0,0 +1,7 @@
+from benchmarks import DEFAULT_IMPORT_BUDGET_S, LIGHTWEIGHT_MODULES, import_check
+
+
+def test_geometry_and_coaching_modules_stay_numpy_only():
+    ok, report = import_check(DEFAULT_IMPORT_BUDGET_S)
+    assert report["heavy_modules"] == [], f"{LIGHTWEIGHT_MODULES} pulled in {report['heavy_modules']}"
+    assert ok, f"import took {report['elapsed_s']:.3f} s, budget {DEFAULT_IMPORT_BUDGET_S} s"
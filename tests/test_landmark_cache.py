@@ -0,0 +1,48 @@
+import numpy as np
+
+from landmark_cache import LandmarkCache
+
+
+def keypoints(i):
+    return np.full((33, 4), i, dtype=np.float32)
+
+
+def fill(cache, start, stop):
+    for i in range(start, stop):
+        cache.put(f"key{i}", keypoints(i), 0.5)
+
+
+def test_reopen_keeps_entries(tmp_path):
+    with LandmarkCache(str(tmp_path), max_entries=100) as cache:
+        fill(cache, 0, 50)
+        cache.put("empty", None, 0.0)
+    cache = LandmarkCache(str(tmp_path), max_entries=100)
+    assert len(cache) == 51
+    np.testing.assert_array_equal(cache.get("key7")[0], keypoints(7))
+    assert cache.get("empty") == (None, 0.0)
+
+
+def test_resize_migrates_most_recent_entries(tmp_path):
+    with LandmarkCache(str(tmp_path), max_entries=300) as cache:
+        fill(cache, 0, 300)
+    with LandmarkCache(str(tmp_path), max_entries=100) as cache:
+        assert len(cache) == 100
+        assert cache.get("key199") is None
+        np.testing.assert_array_equal(cache.get("key250")[0], keypoints(250))
+    with LandmarkCache(str(tmp_path), max_entries=400) as cache:
+        assert len(cache) == 100
+        fill(cache, 300, 600)
+        assert len(cache) == 400
+        np.testing.assert_array_equal(cache.get("key250")[0], keypoints(250))
+
+
+def test_unflushed_slot_reuse_is_not_served(tmp_path):
+    with LandmarkCache(str(tmp_path), max_entries=50, flush_every=0) as cache:
+        fill(cache, 0, 50)
+    cache = LandmarkCache(str(tmp_path), max_entries=50, flush_every=0)
+    fill(cache, 50, 70)  # evicts key0..key19 and reuses their slots, index not rewritten
+    del cache  # no close(): the index on disk is stale
+    cache = LandmarkCache(str(tmp_path), max_entries=50)
+    assert len(cache) == 30
+    for key in list(cache._entries):
+        np.testing.assert_array_equal(cache.get(key)[0], keypoints(int(key[3:])))
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import metrics
+from metrics import PipelineMetrics
+from pose_utils import compare_poses, compute_all_angle_directions, compute_all_angles
+
+cv2 = pytest.importorskip("cv2")
+
+
+@pytest.fixture
+def sink(monkeypatch, fake_backends, tmp_path):
+    monkeypatch.setattr(metrics, "_active", metrics.METRICS)
+    custom = PipelineMetrics(enabled=True)
+    import pose_detector
+    detector = pose_detector.PoseDetector(render_every=1, metrics=custom)
+    detector.landmarks_dir = str(tmp_path)
+    yield custom, detector
+    detector.close()
+
+
+def test_one_cycle_lands_in_one_registry(sink):
+    custom, detector = sink
+    _, png = cv2.imencode(".png", np.zeros((48, 64, 3), dtype=np.uint8))
+    results, _, _ = detector.detect_bytes(png.tobytes(), save_landmarks=True)
+    angles, directions = compute_all_angles(results), compute_all_angle_directions(results)
+    compare_poses(angles, angles, directions, directions)
+    detector.flush_renders()
+
+    stages = custom.snapshot()["stages"]
+    for stage in ("decode", "inference", "render", "draw", "encode", "angles", "feedback"):
+        assert stages[stage]["count"] >= 1, stage
+    assert custom.snapshot()["counters"]["frames"] == 1
+    assert metrics.METRICS.snapshot()["stages"] == {}
+
+
+def test_writer_times_draw_and_encode_on_its_thread(sink):
+    custom, detector = sink
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    for i in range(3):
+        detector.render(image, SimpleNamespace(pose_landmarks=None), f"{i}.png")
+    detector.flush_renders()
+    stages = custom.snapshot()["stages"]
+    assert stages["draw"]["count"] == 3
+    assert stages["encode"]["count"] == 3
+    assert detector.writer.written == 3
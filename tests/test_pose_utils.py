@@ -0,0 +1,135 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from pose_utils import (
+    ANGLE_NAMES,
+    DIRECTION_CODES,
+    DIRECTION_MISSING,
+    DIRECTION_NAMES,
+    TRIPLET_INDICES,
+    angles_to_dict,
+    batch_fix,
+    batch_fixes,
+    calculate_angle,
+    compare_poses,
+    compare_poses_batch,
+    compute_all_angles_and_directions,
+    compute_angles_and_directions_batch,
+    directions_to_dict,
+    get_angle_direction
+)
+
+
+def random_keypoints(n, seed=0):
+    rng = np.random.default_rng(seed)
+    keypoints = rng.uniform(0.0, 1.0, size=(n, 33, 4))
+    # Degenerate joints: a neighbour on top of the vertex, or both on top of it
+    keypoints[0, TRIPLET_INDICES[0, 0]] = keypoints[0, TRIPLET_INDICES[0, 1]]
+    keypoints[1, TRIPLET_INDICES[4, [0, 2]]] = keypoints[1, TRIPLET_INDICES[4, 1]]
+    # Exact diagonal ties (|dx| == |dy|) in every quadrant
+    for frame, (ax, ay, cx, cy) in enumerate([(1, 0, 0, 1), (1, 0, 0, -1), (-1, 0, 0, 1), (-1, 0, 0, -1)], start=2):
+        a, b, c = TRIPLET_INDICES[2]
+        keypoints[frame, b, :2] = (0.5, 0.5)
+        keypoints[frame, a, :2] = (0.5 + 0.25 * ax, 0.5 + 0.25 * ay)
+        keypoints[frame, c, :2] = (0.5 + 0.25 * cx, 0.5 + 0.25 * cy)
+    return keypoints
+
+
+def scalar_reference(frame):
+    angles, directions = [], []
+    for a, b, c in TRIPLET_INDICES:
+        points = [tuple(frame[i, :2]) for i in (a, b, c)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            angles.append(calculate_angle(*points))
+        directions.append(DIRECTION_CODES[get_angle_direction(*points)])
+    return np.array(angles), np.array(directions, dtype=np.int8)
+
+
+def as_results(frame):
+    return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=[
+        SimpleNamespace(x=x, y=y, z=z, visibility=v) for x, y, z, v in frame
+    ]))
+
+
+def test_batch_engine_matches_scalar_functions():
+    keypoints = random_keypoints(200)
+    angles, directions = compute_angles_and_directions_batch(keypoints)
+    assert angles.shape == directions.shape == (200, len(ANGLE_NAMES))
+    for frame, row_angles, row_directions in zip(keypoints, angles, directions):
+        expected_angles, expected_directions = scalar_reference(frame)
+        np.testing.assert_allclose(row_angles, expected_angles, atol=1e-9, equal_nan=True)
+        np.testing.assert_array_equal(row_directions, expected_directions)
+    assert np.isnan(angles[0, 0]) and directions[0, 0] == DIRECTION_CODES["undefined"]
+    assert np.isnan(angles[1, 4]) and directions[1, 4] == DIRECTION_CODES["undefined"]
+    assert [DIRECTION_NAMES[directions[f, 2]] for f in range(2, 6)] == ["down-right", "up-right", "down-left", "up-left"]
+
+
+def test_low_visibility_joints_are_masked():
+    keypoints = random_keypoints(6)[:3]
+    keypoints[:, :, 3] = 0.9
+    keypoints[0, TRIPLET_INDICES[1, 2], 3] = 0.1  # right wrist: only the right elbow uses it
+    keypoints[1, :, :2] = np.nan
+    angles, directions = compute_angles_and_directions_batch(keypoints, min_visibility=0.5)
+    masked = np.zeros((3, len(ANGLE_NAMES)), dtype=bool)
+    masked[0, 1] = True
+    masked[1] = True
+    assert np.array_equal(np.isnan(angles) & masked, masked)
+    assert np.array_equal(directions == DIRECTION_MISSING, masked)
+    unmasked, _ = compute_angles_and_directions_batch(keypoints[0])
+    assert not np.isnan(unmasked[0, 1])
+
+
+@pytest.mark.parametrize("frame", range(6))
+def test_single_frame_path_matches_batch_engine(frame):
+    keypoints = random_keypoints(6)[frame]
+    angles, directions = compute_all_angles_and_directions(as_results(keypoints))
+    batch_angles, batch_directions = compute_angles_and_directions_batch(keypoints)
+    for j, name in enumerate(ANGLE_NAMES):
+        if np.isnan(batch_angles[0, j]):
+            assert angles[name] is None
+        else:
+            assert angles[name] == pytest.approx(batch_angles[0, j], abs=1e-9)
+        assert directions[name] == DIRECTION_NAMES[batch_directions[0, j]]
+
+
+def test_single_frame_path_without_pose():
+    angles, directions = compute_all_angles_and_directions(SimpleNamespace(pose_landmarks=None))
+    assert angles == directions == {name: None for name in ANGLE_NAMES}
+
+
+def random_comparison(students, seed=0):
+    """
+    Random (S, 8) student angles and direction codes plus a reference, each with missing entries
+    (NaN angles, DIRECTION_MISSING) on both sides.
+    """
+    rng = np.random.default_rng(seed)
+    angles_user = rng.uniform(0.0, 180.0, (students, len(ANGLE_NAMES)))
+    angles_user[rng.random(angles_user.shape) < 0.15] = np.nan
+    dirs_user = rng.integers(0, len(DIRECTION_NAMES), angles_user.shape).astype(np.int8)
+    dirs_user[rng.random(dirs_user.shape) < 0.15] = DIRECTION_MISSING
+    angles_ref = rng.uniform(0.0, 180.0, len(ANGLE_NAMES))
+    angles_ref[[1, 6]] = np.nan
+    dirs_ref = rng.integers(0, len(DIRECTION_NAMES), len(ANGLE_NAMES)).astype(np.int8)
+    dirs_ref[[2, 6]] = DIRECTION_MISSING
+    return angles_user, dirs_user, angles_ref, dirs_ref
+
+
+@pytest.mark.parametrize("per_joint", [False, True])
+def test_batch_compare_matches_compare_poses(per_joint):
+    angles_user, dirs_user, angles_ref, dirs_ref = random_comparison(200)
+    threshold = np.linspace(5.0, 40.0, len(ANGLE_NAMES)) if per_joint else 25.0
+    result = compare_poses_batch(angles_user, dirs_user, angles_ref, dirs_ref, threshold)
+    assert (result["angle_action"] != 0).any() and (result["angle_action"] == 0)[result["valid"]].any()
+    assert (result["direction_action"] != 0).any() and (result["direction_action"] == 0).any()
+
+    ref_angles, ref_dirs = angles_to_dict(angles_ref), directions_to_dict(dirs_ref)
+    for s in range(len(angles_user)):
+        expected = compare_poses(
+            angles_to_dict(angles_user[s]), ref_angles, directions_to_dict(dirs_user[s]), ref_dirs,
+            tolerances=threshold if per_joint else None, threshold_deg=25.0
+        )
+        assert batch_fixes(result, s) == expected
+        for j, name in enumerate(ANGLE_NAMES):
+            assert batch_fix(result, s, name) == expected.get(name)
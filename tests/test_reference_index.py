@@ -0,0 +1,53 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from pose_utils import ANGLE_NAMES
+from reference_index import REFERENCE_DIR, ReferenceIndex
+from reference_stats import write_reference
+
+
+@pytest.fixture
+def reference_dir(tmp_path):
+    for name in ("downward_dog_reference.json", "veerabhadrasana_reference.json"):
+        shutil.copy(os.path.join(REFERENCE_DIR, name), tmp_path / name)
+    return str(tmp_path)
+
+
+def touch_later(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_reload_keeps_last_good_reference_on_partial_file(reference_dir):
+    index = ReferenceIndex(reference_dir, reload_interval=None)
+    angles = index.angles.copy()
+    path = os.path.join(reference_dir, "veerabhadrasana_reference.json")
+    with open(path, "r") as f:
+        text = f.read()
+    with open(path, "w") as f:
+        f.write(text[:len(text) // 2])  # a writer caught mid-dump
+    touch_later(path)
+
+    assert index.reload_if_changed()
+    assert index.pose_names == ["downward_dog", "veerabhadrasana"]
+    np.testing.assert_array_equal(index.angles, angles)
+    assert index.rank(angles[1])[0][0] == "veerabhadrasana"
+
+    # Once the file is complete again it is picked up on the next check
+    data = json.loads(text)
+    data["angles"][ANGLE_NAMES[0]] = 1.0
+    write_reference(path, data)
+    touch_later(path)
+    assert index.reload_if_changed()
+    assert index.angles[1, 0] == 1.0
+
+
+def test_unreadable_new_reference_is_skipped(reference_dir):
+    with open(os.path.join(reference_dir, "broken_reference.json"), "w") as f:
+        f.write("{")
+    index = ReferenceIndex(reference_dir, reload_interval=None)
+    assert index.pose_names == ["downward_dog", "veerabhadrasana"]
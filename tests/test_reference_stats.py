@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+import pytest
+
+from pose_utils import ANGLE_NAMES, DIRECTION_MISSING, DIRECTION_NAMES
+from reference_stats import ReferenceStats, load_reference_stats, save_reference
+
+
+def random_samples(n, seed=0):
+    """
+    (n, 8) angles and direction codes with missing entries; joint 6 is never observed
+    and joint 7 only once.
+    """
+    rng = np.random.default_rng(seed)
+    angles = rng.uniform(0.0, 180.0, (n, len(ANGLE_NAMES)))
+    angles[rng.random(angles.shape) < 0.2] = np.nan
+    angles[:, 6] = np.nan
+    angles[1:, 7] = np.nan
+    directions = rng.integers(0, len(DIRECTION_NAMES), angles.shape).astype(np.int8)
+    directions[rng.random(directions.shape) < 0.2] = DIRECTION_MISSING
+    directions[:, 6] = DIRECTION_MISSING
+    return angles, directions
+
+
+def one_at_a_time(angles, directions):
+    stats = ReferenceStats()
+    for a, d in zip(angles, directions):
+        stats.add(a, d)
+    return stats
+
+
+def batched(angles, directions):
+    stats = ReferenceStats()
+    stats.add_batch(angles, directions)
+    return stats
+
+
+def merged_partials(angles, directions):
+    stats = ReferenceStats()
+    for lo, hi in ((0, 7), (7, 7), (7, 40), (40, len(angles))):
+        partial = ReferenceStats()
+        partial.add_batch(angles[lo:hi], directions[lo:hi])
+        stats.merge(partial)
+    return stats
+
+
+@pytest.mark.parametrize("build", [one_at_a_time, batched, merged_partials])
+def test_statistics_match_numpy(build):
+    angles, directions = random_samples(100)
+    stats = build(angles, directions)
+    valid = ~np.isnan(angles)
+    np.testing.assert_array_equal(stats.count, valid.sum(axis=0))
+    with pytest.warns(RuntimeWarning):  # joint 6 has no samples
+        expected_mean = np.nanmean(angles, axis=0)
+        expected_var = np.nanvar(angles, axis=0, ddof=1)
+    np.testing.assert_allclose(stats.mean[valid.any(axis=0)], expected_mean[valid.any(axis=0)], rtol=1e-12)
+    np.testing.assert_allclose(stats.variance, expected_var, rtol=1e-10)
+    assert np.isnan(stats.variance[6]) and np.isnan(stats.variance[7])
+
+    for j in range(len(ANGLE_NAMES)):
+        column = directions[:, j]
+        counts = np.bincount(column[column != DIRECTION_MISSING], minlength=len(DIRECTION_NAMES))
+        np.testing.assert_array_equal(stats.direction_counts[j], counts)
+    assert stats.directions()[6] == DIRECTION_MISSING
+    np.testing.assert_array_equal(stats.directions()[:6], stats.direction_counts[:6].argmax(axis=1))
+
+
+def test_reference_round_trip(tmp_path):
+    angles, directions = random_samples(50)
+    stats = batched(angles, directions)
+    data = json.loads(json.dumps(stats.to_reference("downward_dog")))
+    assert data["angles"][ANGLE_NAMES[6]] is None and data["directions"][ANGLE_NAMES[6]] is None
+
+    restored = ReferenceStats.from_reference(data)
+    for field in ("count", "mean", "m2", "direction_counts"):
+        np.testing.assert_array_equal(getattr(restored, field), getattr(stats, field))
+
+    path = str(tmp_path / "downward_dog_reference.json")
+    save_reference(path, "downward_dog", stats)
+    pose_name, loaded = load_reference_stats(path)
+    assert pose_name == "downward_dog"
+    np.testing.assert_array_equal(loaded.m2, stats.m2)
+
+
+def test_reference_without_stats_is_rejected():
+    with pytest.raises(ValueError, match="no running statistics"):
+        ReferenceStats.from_reference({"pose_name": "downward_dog", "angles": {}, "directions": {}})
+
+
+def test_tolerances_are_clipped_and_need_two_samples():
+    stats = ReferenceStats()
+    # Sample std per joint: 1, 5, 20, 100 and 0; joints 5-7 have 0, 1 and 1 samples
+    for offsets in ([-1, -5, -20, -100, 0, np.nan, 0, 0], [1, 5, 20, 100, 0, np.nan, np.nan, np.nan]):
+        stats.add(90.0 + np.asarray(offsets, dtype=np.float64) / np.sqrt(2), np.zeros(8, dtype=np.int8))
+    tolerances = stats.tolerances(k=2.0, min_deg=5.0, max_deg=25.0)
+    assert tolerances == {
+        ANGLE_NAMES[0]: 5.0,
+        ANGLE_NAMES[1]: pytest.approx(10.0),
+        ANGLE_NAMES[2]: 25.0,
+        ANGLE_NAMES[3]: 25.0,
+        ANGLE_NAMES[4]: 5.0,
+        ANGLE_NAMES[5]: None,
+        ANGLE_NAMES[6]: None,
+        ANGLE_NAMES[7]: None
+    }
+    assert stats.tolerances(k=1.0, min_deg=0.0, max_deg=200.0)[ANGLE_NAMES[3]] == pytest.approx(100.0)
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import metrics
+import service
+from metrics import PipelineMetrics, get_metrics
+from reference_index import REFERENCE_DIR
+
+
+def fake_init_worker(detector_kwargs):
+    service.enable_metrics()
+
+
+def fake_detect_batch(frames):
+    """
+    Worker task standing in for Mediapipe: b"none" finds no pose, b"bad" fails to decode.
+    """
+    sink = get_metrics()
+    out = []
+    for data in frames:
+        with sink.stage("inference"):
+            if data == b"bad":
+                out.append((None, 0.0, "Could not decode image data."))
+                continue
+            detected = data != b"none"
+            sink.record_detection(0.9, detected)
+            out.append((np.full((33, 4), 0.5) + np.arange(33)[:, None] * 0.01 if detected else None, 0.9, None))
+    return out, sink.drain()
+
+
+@pytest.fixture
+def pose_service(monkeypatch, tmp_path):
+    for name in os.listdir(REFERENCE_DIR):
+        shutil.copy(os.path.join(REFERENCE_DIR, name), tmp_path / name)
+    monkeypatch.setattr(service, "_init_worker", fake_init_worker)
+    monkeypatch.setattr(service, "_detect_batch", fake_detect_batch)
+    monkeypatch.setattr(metrics, "_active", PipelineMetrics())
+    return service.PoseService(port=0, workers=1, reference_dir=str(tmp_path))
+
+
+def run(pose_service, coroutine_fn):
+    async def main():
+        await pose_service.start()
+        try:
+            return await asyncio.wait_for(coroutine_fn(), timeout=10)
+        finally:
+            await pose_service.stop()
+    return asyncio.run(main())
+
+
+def test_detect_and_metrics(pose_service):
+    async def scenario():
+        detected = await pose_service.analyze(b"frame", "downward_dog")
+        missing = await pose_service.analyze(b"none")
+        with pytest.raises(ValueError):
+            await pose_service.analyze(b"bad")
+        return detected, missing, await pose_service._route("GET", "/metrics", b"")
+
+    detected, missing, (status, text) = run(pose_service, scenario)
+    assert detected["detected"] and "feedback" in detected
+    assert missing == {"detected": False, "confidence": 0.0}
+    assert status == 200
+    assert "pose_pipeline_frames_total 2" in text
+    assert 'pose_pipeline_stage_latency_seconds_count{stage="inference"} 3' in text
+    assert pose_service.pending == 0
+
+
+def test_failure_after_detection_resolves_every_request(pose_service, monkeypatch):
+    def broken_rank(*args, **kwargs):
+        raise RuntimeError("reference matrices being rebuilt")
+    monkeypatch.setattr(pose_service.references, "rank", broken_rank)
+
+    async def scenario():
+        results = await asyncio.gather(*(pose_service.analyze(b"frame") for _ in range(4)),
+                                       pose_service.analyze(b"none"), return_exceptions=True)
+        status, payload = await pose_service._route("POST", "/detect", b"frame")
+        return results, status, payload
+
+    results, status, payload = run(pose_service, scenario)
+    assert all(isinstance(r, RuntimeError) for r in results[:4])
+    assert results[4] == {"detected": False, "confidence": 0.0}
+    assert status == 500 and "reference matrices" in payload["error"]
+    assert pose_service.pending == 0
+
+
+def raw_request(port, data):
+    async def send():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(data)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+    return send()
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5"])
+def test_invalid_content_length_is_rejected(pose_service, length):
+    async def scenario():
+        return await raw_request(pose_service.port, b"POST /detect HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+
+    response = run(pose_service, scenario)
+    assert response.startswith(b"HTTP/1.1 400")
+    assert b"invalid Content-Length" in response
+
+
+def test_uncomparable_distances_serialize_as_null(pose_service, monkeypatch):
+    monkeypatch.setattr(pose_service.references, "rank", lambda *args, **kwargs: [("downward_dog", float("nan"))])
+
+    async def scenario():
+        request = b"POST /detect HTTP/1.1\r\nContent-Length: 5\r\nConnection: close\r\n\r\nframe"
+        return await raw_request(pose_service.port, request)
+
+    response = run(pose_service, scenario)
+    body = json.loads(response.split(b"\r\n\r\n", 1)[1], parse_constant=lambda name: pytest.fail(f"bare {name}"))
+    assert body["closest_poses"] == [["downward_dog", None]]
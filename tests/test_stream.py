@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from conftest import FakePose
+from landmark_recording import LandmarkRecorder, LandmarkRecording
+from preprocess import FramePreprocessor
+
+NUM_FRAMES = 90
+
+
+@pytest.fixture
+def clip(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("No MJPG video encoder available")
+    for i in range(NUM_FRAMES):
+        writer.write(np.full((48, 64, 3), i, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_stream_file_yields_every_frame(detector, clip):
+    items = list(detector.stream(clip, max_queue_size=2))
+    assert [frame_idx for frame_idx, _, _, _ in items] == list(range(NUM_FRAMES))
+    timestamps = [timestamp for _, timestamp, _, _ in items]
+    assert timestamps == sorted(timestamps)
+    assert all(keypoints.shape == (33, 4) for _, _, keypoints, _ in items)
+    assert detector.dropped_frames == 0
+
+
+def test_stream_frame_skip(detector, clip):
+    items = list(detector.stream(clip, frame_skip=2))
+    assert [frame_idx for frame_idx, _, _, _ in items] == list(range(0, NUM_FRAMES, 3))
+
+
+def test_stream_drop_oldest_counts_dropped_frames(detector, clip):
+    items = list(detector.stream(clip, max_queue_size=2, drop_oldest=True))
+    assert len(items) + detector.dropped_frames == NUM_FRAMES
+    assert detector.dropped_frames > 0
+
+
+def test_stream_forwards_capture_errors(detector, clip):
+    class FailingCapture:
+        def __init__(self, path):
+            self.capture = cv2.VideoCapture(path)
+            self.reads = 0
+
+        def isOpened(self):
+            return self.capture.isOpened()
+
+        def get(self, prop):
+            return self.capture.get(prop)
+
+        def read(self):
+            self.reads += 1
+            if self.reads > 5:
+                raise RuntimeError("device unplugged")
+            return self.capture.read()
+
+    capture = FailingCapture(clip)
+    seen = []
+    with pytest.raises(RuntimeError, match="device unplugged"):
+        for frame_idx, _, _, _ in detector.stream(capture):
+            seen.append(frame_idx)
+    assert seen == list(range(5))
+    capture.capture.release()
+
+
+def test_record_stream(detector, clip, tmp_path):
+    path = str(tmp_path / "clip.rec")
+    with LandmarkRecorder(path, chunk_frames=32) as recorder:
+        items = list(recorder.record(detector.stream(clip)))
+    recording = LandmarkRecording(path)
+    timestamps, keypoints, confidence = recording.frames()
+    assert len(recording) == len(items) == NUM_FRAMES
+    np.testing.assert_allclose(keypoints, np.stack([k for _, _, k, _ in items]), rtol=1e-6)
+    np.testing.assert_allclose(timestamps, [t for _, t, _, _ in items])
+
+
+def test_stream_keeps_the_crop_fixed_while_tracking(detector, clip):
+    detector.preprocessor = FramePreprocessor(target_size=None)
+    items = list(detector.stream(clip))
+    pose = detector.tracking_pose
+    assert pose.shapes[0] == (48, 64, 3)  # first detection on the full frame
+    assert len(set(pose.shapes[1:])) == 1 and pose.shapes[1] != pose.shapes[0]
+    assert pose.resets == 1
+    # A fixed crop maps the (fixed) fake landmarks to the same full-frame keypoints on every frame
+    for _, _, keypoints, _ in items[2:]:
+        np.testing.assert_array_equal(keypoints, items[1][2])
+
+
+def test_stream_returns_to_the_full_frame_when_tracking_is_lost(detector, clip, monkeypatch):
+    monkeypatch.setattr(FakePose, "misses", (30,))
+    detector.preprocessor = FramePreprocessor(target_size=None)
+    items = list(detector.stream(clip))
+    pose = detector.tracking_pose
+    assert items[29][2] is None
+    assert pose.shapes[30] == (48, 64, 3)  # re-detection after the loss
+    assert pose.shapes[31] == pose.shapes[1]
+    assert pose.resets == 2
+
+
+def test_each_stream_starts_with_a_fresh_tracking_graph(detector, clip):
+    list(detector.stream(clip))
+    pose = detector.tracking_pose
+    resets = pose.resets
+    list(detector.stream(clip))
+    assert detector.tracking_pose is pose
+    assert pose.resets == resets + 1
+
+
+def test_calibration_closes_every_graph_it_does_not_keep(detector, clip, monkeypatch):
+    graphs = []
+
+    def make_pose(**kwargs):
+        graphs.append(FakePose(**kwargs))
+        return graphs[-1]
+
+    monkeypatch.setattr(detector.mp_pose, "Pose", make_pose)
+    list(detector.stream(clip))
+    pose, tracking_pose = detector.pose, detector.tracking_pose
+    # 10 ms per fake inference: only complexity 0 fits a 1 ms budget
+    assert detector.calibrate_model_complexity(np.zeros((48, 64, 3), dtype=np.uint8), 1.0) == 0
+    assert len(graphs) == 4  # the tracking graph, then one per complexity
+    assert detector.pose is graphs[-1] and not graphs[-1].closed
+    assert all(graph.closed for graph in graphs[1:-1])
+    assert pose.closed and tracking_pose.closed and detector.tracking_pose is None